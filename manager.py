@@ -23,6 +23,7 @@ from src.utilities.start_project_functions import create_project_description_fil
 from src.utilities.util_functions import join_paths
 from src.utilities.llms import init_llms
 from src.utilities.print_formatters import print_formatted
+from src.utilities.file_watcher import start_file_watcher
 import json
 import os
 
@@ -152,6 +153,7 @@ What have been done so far:
 
     def run(self):
         print_formatted("😀 Hello! I'm Manager agent. Let's plan your project together!", color="green")
+        start_file_watcher(self.work_dir)
         if not os.path.exists(self.saved_messages_path):
             # new start
             project_tasks = get_project_tasks()
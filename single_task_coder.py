@@ -16,6 +16,8 @@ from src.utilities.user_input import user_input
 from src.utilities.print_formatters import print_formatted
 from src.utilities.start_project_functions import set_up_dot_clean_coder_dir
 from src.utilities.util_functions import create_frontend_feedback_story
+from src.utilities.file_watcher import start_file_watcher
+from src.utilities.edit_journal import EditJournal, rollback
 from concurrent.futures import ThreadPoolExecutor
 
 
@@ -23,6 +25,8 @@ use_frontend_feedback = bool(os.getenv("FRONTEND_PORT"))
 
 
 def run_clean_coder_pipeline(task, work_dir):
+    start_file_watcher(work_dir)
+    EditJournal.start_run(work_dir)
     researcher = Researcher(work_dir)
     file_paths, image_paths = researcher.research_task(task)
 
@@ -45,9 +49,23 @@ def run_clean_coder_pipeline(task, work_dir):
         file_paths = executor.do_task(task, plan)
         first_vfeedback_screenshots_msg = None
 
-    human_message = user_input("Please test app and provide commentary if debugging/additional refinement is needed.")
+    human_message = user_input(
+        "Please test app and provide commentary if debugging/additional refinement is needed. "
+        "Type 'rollback' to revert all changes made for this task."
+    )
     if human_message in ['o', 'ok']:
         return
+    if human_message == 'rollback':
+        reverted, conflicts, failed = rollback(work_dir)
+        print_formatted(f"Reverted {len(reverted)} edits.", color="green")
+        if conflicts:
+            print_formatted(f"{len(conflicts)} edits not reverted, as files have been changed after them.", color="red")
+        if failed:
+            print_formatted(
+                f"Edits of files that could not be read or written not reverted: {', '.join(sorted(set(failed)))}",
+                color="red",
+            )
+        return
     debugger = Debugger(file_paths, work_dir, human_message, first_vfeedback_screenshots_msg, playwright_codes, screenshot_descriptions)
     debugger.do_task(task, plan)
 
@@ -1,7 +1,8 @@
 import os
 from src.tools.tools_coder_pipeline import (
     ask_human_tool, prepare_list_dir_tool, prepare_see_file_tool,
-    prepare_create_file_tool, prepare_replace_code_tool, prepare_insert_code_tool
+    prepare_create_file_tool, prepare_replace_code_tool, prepare_insert_code_tool, prepare_apply_edits_tool,
+    prepare_replace_snippet_tool, prepare_insert_after_snippet_tool,
 )
 from typing import TypedDict, Sequence
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
@@ -9,8 +10,12 @@ from langgraph.graph import StateGraph
 from dotenv import load_dotenv, find_dotenv
 from langchain.tools import tool
 from src.utilities.print_formatters import print_formatted
-from src.utilities.util_functions import check_file_contents, check_application_logs, exchange_file_contents, bad_tool_call_looped
+from src.utilities.util_functions import (
+    render_file_blocks, file_contents_message, check_application_logs, exchange_file_contents, bad_tool_call_looped,
+)
 from src.utilities.llms import init_llms
+from src.utilities.edit_journal import EditJournal
+from src.utilities.approval_queue import ApprovalQueue
 from src.utilities.langgraph_common_functions import (
     call_model, call_tool, ask_human, after_ask_human_condition, multiple_tools_msg, no_tools_msg,
     agent_looped_human_help,
@@ -63,6 +68,7 @@ class Debugger():
         debugger_workflow.add_node("frontend_screenshots", self.frontend_screenshots)
         debugger_workflow.add_node("human_help", agent_looped_human_help)
         debugger_workflow.add_node("human_end_process_confirmation", ask_human)
+        debugger_workflow.add_node("review_changes", self.review_changes)
 
         debugger_workflow.set_entry_point("agent")
 
@@ -71,6 +77,7 @@ class Debugger():
         debugger_workflow.add_edge("frontend_screenshots", "human_end_process_confirmation")
         debugger_workflow.add_conditional_edges("agent", self.after_agent_condition)
         debugger_workflow.add_conditional_edges("check_log", self.after_check_log_condition)
+        debugger_workflow.add_conditional_edges("review_changes", self.after_review_condition)
         debugger_workflow.add_conditional_edges("human_end_process_confirmation", after_ask_human_condition)
 
         self.debugger = debugger_workflow.compile()
@@ -81,6 +88,7 @@ class Debugger():
         return state
 
     def call_tool_debugger(self, state):
+        EditJournal.start_step("Debugger")
         state = call_tool(state, self.tools)
         messages = [msg for msg in state["messages"] if msg.type == "ai"]
         last_ai_message = messages[-1]
@@ -88,6 +96,19 @@ class Debugger():
             for tool_call in last_ai_message.tool_calls:
                 state["messages"].append(ToolMessage(content="too much tool calls", tool_call_id=tool_call["id"]))
             state["messages"].append(HumanMessage(content=multiple_tools_msg))
+        review_feedback = ApprovalQueue.review_if_full()
+        if review_feedback:
+            state["messages"].append(HumanMessage(content=review_feedback))
+        state = exchange_file_contents(state, self.files, self.work_dir)
+        return state
+
+    def review_changes(self, state):
+        # changes queued for approval are reviewed before finishing
+        last_ai_message = [msg for msg in state["messages"] if msg.type == "ai"][-1]
+        for tool_call in last_ai_message.tool_calls:
+            state["messages"].append(ToolMessage(content="Waiting for review of queued changes.", tool_call_id=tool_call["id"]))
+        review_feedback = ApprovalQueue.review()
+        state["messages"].append(HumanMessage(content=review_feedback))
         state = exchange_file_contents(state, self.files, self.work_dir)
         return state
 
@@ -118,15 +139,23 @@ class Debugger():
         elif last_message.content in (multiple_tools_msg, no_tools_msg):
              return "agent"
         elif last_message.tool_calls and last_message.tool_calls[0]["name"] == "final_response_debugger":
-            if log_file_path:
-                return "check_log"
-            elif self.screenshot_descriptions:
-                return "frontend_screenshots"
-            else:
-                return "human_end_process_confirmation"
+            if ApprovalQueue.pending:
+                return "review_changes"
+            return self.after_final_response()
         else:
             return "tool"
 
+    def after_review_condition(self, state):
+        return "agent" if ApprovalQueue.last_not_applied else self.after_final_response()
+
+    def after_final_response(self):
+        if log_file_path:
+            return "check_log"
+        elif self.screenshot_descriptions:
+            return "frontend_screenshots"
+        else:
+            return "human_end_process_confirmation"
+
     def after_check_log_condition(self, state):
         last_message = state["messages"][-1]
 
@@ -141,11 +170,13 @@ class Debugger():
     def do_task(self, task, plan):
         print_formatted("Debugger starting its work", color="green")
         print_formatted("🛠️ Need to improve your code? I can help!", color="light_blue")
-        file_contents = check_file_contents(self.files, self.work_dir)
         inputs = {"messages": [
             self.system_message,
-            HumanMessage(content=f"Task: {task}\n\n######\n\nPlan which developer implemented already:\n\n{plan}"),
-            HumanMessage(content=f"File contents: {file_contents}", contains_file_contents=True),
+            HumanMessage(
+                content=f"Task: {task}\n\n######\n\nPlan which developer implemented already:\n\n{plan}",
+                cache_breakpoint=True,
+            ),
+            file_contents_message(render_file_blocks(sorted(self.files), self.work_dir)),
             HumanMessage(content=f"Human feedback: {self.human_feedback}")
         ]}
         if self.visual_feedback:
@@ -159,6 +190,12 @@ def prepare_tools(work_dir):
     replace_code = prepare_replace_code_tool(work_dir)
     insert_code = prepare_insert_code_tool(work_dir)
     create_file = prepare_create_file_tool(work_dir)
-    tools = [list_dir, see_file, replace_code, insert_code, create_file, ask_human_tool, final_response_debugger]
+    replace_snippet = prepare_replace_snippet_tool(work_dir)
+    insert_after_snippet = prepare_insert_after_snippet_tool(work_dir)
+    apply_edits = prepare_apply_edits_tool(work_dir)
+    tools = [
+        list_dir, see_file, replace_code, insert_code, replace_snippet, insert_after_snippet, create_file, apply_edits,
+        ask_human_tool, final_response_debugger,
+    ]
 
     return tools
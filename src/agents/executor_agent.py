@@ -1,6 +1,7 @@
 import os
 from src.tools.tools_coder_pipeline import (
-    ask_human_tool, prepare_create_file_tool, prepare_replace_code_tool, prepare_insert_code_tool
+    ask_human_tool, prepare_create_file_tool, prepare_replace_code_tool, prepare_insert_code_tool,
+    prepare_apply_edits_tool, prepare_replace_snippet_tool, prepare_insert_after_snippet_tool,
 )
 from typing import TypedDict, Sequence
 from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage, ToolMessage
@@ -8,9 +9,11 @@ from langgraph.graph import StateGraph, END
 from dotenv import load_dotenv, find_dotenv
 from langchain.tools import tool
 from src.utilities.llms import init_llms
+from src.utilities.edit_journal import EditJournal
+from src.utilities.approval_queue import ApprovalQueue
 from src.utilities.print_formatters import print_formatted, print_error
 from src.utilities.util_functions import (
-    check_file_contents, exchange_file_contents, bad_tool_call_looped
+    render_file_blocks, file_contents_message, exchange_file_contents, bad_tool_call_looped, edits_of_tool_call,
 )
 from src.utilities.langgraph_common_functions import (
     call_model, call_tool, multiple_tools_msg, no_tools_msg, agent_looped_human_help
@@ -55,6 +58,7 @@ class Executor():
         executor_workflow.add_node("agent", self.call_model_executor)
         executor_workflow.add_node("tool", self.call_tool_executor)
         executor_workflow.add_node("human_help", agent_looped_human_help)
+        executor_workflow.add_node("review_changes", self.review_changes)
 
         executor_workflow.set_entry_point("agent")
 
@@ -62,6 +66,7 @@ class Executor():
         executor_workflow.add_edge("tool", "agent")
         executor_workflow.add_edge("human_help", "agent")
         executor_workflow.add_conditional_edges("agent", self.after_agent_condition)
+        executor_workflow.add_conditional_edges("review_changes", self.after_review_condition)
 
         self.executor = executor_workflow.compile()
 
@@ -77,12 +82,30 @@ class Executor():
         return state
 
     def call_tool_executor(self, state):
+        EditJournal.start_step("Executor")
         state = call_tool(state, self.tools)
         messages = [msg for msg in state["messages"] if msg.type == "ai"]
         last_ai_message = messages[-1]
         for tool_call in last_ai_message.tool_calls:
             if tool_call["name"] == "create_file_with_code":
                 self.files.add(tool_call["args"]["filename"])
+            elif tool_call["name"] == "apply_edits":
+                self.files.update(
+                    edit["filename"] for edit in edits_of_tool_call(tool_call) if edit.get("action") == "create"
+                )
+        review_feedback = ApprovalQueue.review_if_full()
+        if review_feedback:
+            state["messages"].append(HumanMessage(content=review_feedback))
+        state = exchange_file_contents(state, self.files, self.work_dir)
+        return state
+
+    def review_changes(self, state):
+        # changes queued for approval are reviewed before finishing
+        last_ai_message = [msg for msg in state["messages"] if msg.type == "ai"][-1]
+        for tool_call in last_ai_message.tool_calls:
+            state["messages"].append(ToolMessage(content="Waiting for review of queued changes.", tool_call_id=tool_call["id"]))
+        review_feedback = ApprovalQueue.review()
+        state["messages"].append(HumanMessage(content=review_feedback))
         state = exchange_file_contents(state, self.files, self.work_dir)
         return state
 
@@ -96,19 +119,23 @@ class Executor():
         elif last_message.content in (multiple_tools_msg, no_tools_msg):
             return "agent"
         elif last_message.tool_calls[0]["name"] == "final_response_executor":
+            if ApprovalQueue.pending:
+                return "review_changes"
             return END
         else:
             return "tool"
 
+    def after_review_condition(self, state):
+        return "agent" if ApprovalQueue.last_not_applied else END
+
     # just functions
     def do_task(self, task, plan):
         print_formatted("Executor starting its work", color="green")
         print_formatted("✅ I follow the plan and will implement necessary changes!", color="light_blue")
-        file_contents = check_file_contents(self.files, self.work_dir)
         inputs = {"messages": [
             self.system_message,
-            HumanMessage(content=f"Task: {task}\n\n######\n\nPlan:\n\n{plan}"),
-            HumanMessage(content=f"File contents: {file_contents}", contains_file_contents=True)
+            HumanMessage(content=f"Task: {task}\n\n######\n\nPlan:\n\n{plan}", cache_breakpoint=True),
+            file_contents_message(render_file_blocks(sorted(self.files), self.work_dir))
         ]}
         self.executor.invoke(inputs, {"recursion_limit": 150})
 
@@ -119,6 +146,12 @@ def prepare_tools(work_dir):
     replace_code = prepare_replace_code_tool(work_dir)
     insert_code = prepare_insert_code_tool(work_dir)
     create_file = prepare_create_file_tool(work_dir)
-    tools = [replace_code, insert_code, create_file, ask_human_tool, final_response_executor]
+    replace_snippet = prepare_replace_snippet_tool(work_dir)
+    insert_after_snippet = prepare_insert_after_snippet_tool(work_dir)
+    apply_edits = prepare_apply_edits_tool(work_dir)
+    tools = [
+        replace_code, insert_code, replace_snippet, insert_after_snippet, create_file, apply_edits, ask_human_tool,
+        final_response_executor,
+    ]
 
     return tools
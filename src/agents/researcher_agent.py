@@ -4,9 +4,9 @@ from langgraph.graph import StateGraph
 from dotenv import load_dotenv, find_dotenv
 from langchain.tools import tool
 from src.tools.tools_coder_pipeline import (
-     prepare_see_file_tool, prepare_list_dir_tool, retrieve_files_by_semantic_query
+     prepare_see_file_tool, prepare_see_file_outline_tool, prepare_list_dir_tool, retrieve_files_by_semantic_query
 )
-from src.tools.rag.retrieval import vdb_available
+from src.tools.rag.retrieval import retrieval_available
 from src.utilities.util_functions import list_directory_tree
 from src.utilities.langgraph_common_functions import (
     call_model, call_tool, ask_human, after_ask_human_condition, no_tools_msg
@@ -62,9 +62,10 @@ def after_agent_condition(state):
 class Researcher():
     def __init__(self, work_dir):
         see_file = prepare_see_file_tool(work_dir)
+        see_file_outline = prepare_see_file_outline_tool(work_dir)
         list_dir = prepare_list_dir_tool(work_dir)
-        self.tools = [see_file, list_dir, final_response_researcher]
-        if vdb_available():
+        self.tools = [see_file, see_file_outline, list_dir, final_response_researcher]
+        if retrieval_available():
             self.tools.append(retrieve_files_by_semantic_query)
         self.llms = init_llms_mini(self.tools, "Researcher")
 
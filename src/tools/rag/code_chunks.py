@@ -0,0 +1,128 @@
+"""
+Splitting of source files into chunks (functions, classes, template/script/style sections) with line ranges,
+embedded in vector database next to file descriptions, so retrieval can point to the exact region of a file.
+"""
+import ast
+import re
+
+
+MAX_CHUNK_LINES = 80
+MIN_CHUNK_LINES = 3
+
+js_declaration_pattern = re.compile(
+    r"^(export\s+)?(default\s+)?(async\s+)?(function|class|const|let|var|interface|type|enum)\b"
+)
+vue_section_pattern = re.compile(r"^<(template|script|style)\b[^>]*>", re.MULTILINE)
+
+
+class Chunk:
+    def __init__(self, start_line, end_line, text, name):
+        self.start_line = start_line
+        self.end_line = end_line
+        self.text = text
+        self.name = name
+
+
+def split_into_chunks(content, filename):
+    """Returns list of chunks; line numbers are 1-based and inclusive."""
+    lines = content.split('\n')
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension == 'py':
+        ranges = python_ranges(content, len(lines))
+    elif extension == 'vue':
+        ranges = vue_ranges(lines)
+    else:
+        ranges = brace_language_ranges(lines, 1, len(lines))
+
+    chunks = []
+    for start, end, name in ranges:
+        for window_start in range(start, end + 1, MAX_CHUNK_LINES):
+            window_end = min(window_start + MAX_CHUNK_LINES - 1, end)
+            text = '\n'.join(lines[window_start - 1:window_end])
+            if text.strip():
+                chunks.append(Chunk(window_start, window_end, f"{filename} ({name}):\n{text}", name))
+    return chunks
+
+
+def python_ranges(content, lines_count):
+    try:
+        tree = ast.parse(content)
+    except SyntaxError:
+        return brace_language_ranges(content.split('\n'), 1, lines_count)
+    ranges = []
+    module_code_start = None
+    for node in tree.body:
+        start = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+        end = node.end_lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if module_code_start is not None:
+                ranges.append((module_code_start, start - 1, "module code"))
+                module_code_start = None
+            if isinstance(node, ast.ClassDef) and end - start + 1 > MAX_CHUNK_LINES:
+                ranges.extend(class_ranges(node, start))
+            else:
+                ranges.append((start, end, node.name))
+        elif module_code_start is None:
+            module_code_start = start
+    if module_code_start is not None:
+        ranges.append((module_code_start, lines_count, "module code"))
+    return ranges
+
+
+def class_ranges(class_node, class_start):
+    ranges = []
+    previous_end = class_start - 1
+    for node in class_node.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+        if start - 1 > previous_end:
+            ranges.append((previous_end + 1, start - 1, class_node.name))
+        ranges.append((start, node.end_lineno, f"{class_node.name}.{node.name}"))
+        previous_end = node.end_lineno
+    if previous_end < class_node.end_lineno:
+        ranges.append((previous_end + 1, class_node.end_lineno, class_node.name))
+    return ranges
+
+
+def vue_ranges(lines):
+    content = '\n'.join(lines)
+    ranges = []
+    for match in vue_section_pattern.finditer(content):
+        section = match.group(1)
+        start = content.count('\n', 0, match.start()) + 1
+        closing = content.find(f"</{section}>", match.end())
+        end = content.count('\n', 0, closing) + 1 if closing != -1 else len(lines)
+        if section == 'script':
+            ranges.extend(brace_language_ranges(lines, start, end))
+        else:
+            ranges.append((start, end, section))
+    return ranges or brace_language_ranges(lines, 1, len(lines))
+
+
+def brace_language_ranges(lines, first_line, last_line):
+    """Heuristic for JS-like languages: top-level declarations, ended when bracket depth returns to zero."""
+    ranges = []
+    depth = 0
+    chunk_start = first_line
+    chunk_name = "code"
+    for line_number in range(first_line, last_line + 1):
+        line = lines[line_number - 1]
+        stripped = line.strip()
+        if depth == 0 and line_number > chunk_start and (js_declaration_pattern.match(stripped) or not stripped):
+            if line_number - chunk_start >= MIN_CHUNK_LINES or not stripped:
+                ranges.append((chunk_start, line_number - 1, chunk_name))
+                chunk_start = line_number
+                chunk_name = "code"
+        if depth == 0 and js_declaration_pattern.match(stripped):
+            name_match = re.search(r"(?:function|class|const|let|var|interface|type|enum)\s+([\w$]+)", stripped)
+            chunk_name = name_match.group(1) if name_match else chunk_name
+        depth = max(depth + line.count('{') + line.count('(') + line.count('[')
+                    - line.count('}') - line.count(')') - line.count(']'), 0)
+    if chunk_start <= last_line:
+        ranges.append((chunk_start, last_line, chunk_name))
+    # drop empty ranges made of blank lines only
+    return [
+        (start, end, name) for start, end, name in ranges
+        if end >= start and any(lines[i - 1].strip() for i in range(start, end + 1))
+    ]
@@ -0,0 +1,46 @@
+"""
+Listing of project code files used for building indexes of the project.
+"""
+import os
+from pathlib import Path
+from src.utilities.start_work_functions import file_folder_ignored, CoderIgnore
+from src.utilities.file_watcher import FileWatcher
+
+
+def is_code_file(file_path):
+    # List of common code file extensions
+    code_extensions = {
+        '.js', '.jsx', '.ts', '.tsx', '.vue', '.py', '.rb', '.php', '.java', '.c', '.cpp', '.cs', '.go', '.swift',
+        '.kt', '.rs', '.htm','.html', '.css', '.scss', '.sass', '.less', '.prompt',
+    }
+    return file_path.suffix.lower() in code_extensions
+
+
+def list_code_files(work_dir, subfolders_with_files=['/']):
+    all_files = []
+
+    if FileWatcher.running():
+        # watcher already keeps list of project files
+        folders = [os.path.normpath(work_dir + folder) for folder in subfolders_with_files]
+        for path in FileWatcher.files():
+            file_path = Path(path)
+            if is_code_file(file_path) and any(path == f or path.startswith(f + os.sep) for f in folders):
+                all_files.append(file_path)
+    else:
+        forbidden = _forbidden_patterns()
+        for folder in subfolders_with_files:
+            for root, dirs, files in os.walk(work_dir + folder):
+                rel_root = os.path.relpath(root, work_dir)
+                dirs[:] = [d for d in dirs if not file_folder_ignored(os.path.join(rel_root, d), forbidden)]
+                for file in files:
+                    file_path = Path(root) / file
+                    if is_code_file(file_path) and not file_folder_ignored(os.path.join(rel_root, file), forbidden):
+                        all_files.append(file_path)
+    return all_files
+
+
+def _forbidden_patterns():
+    try:
+        return CoderIgnore.get_forbidden()
+    except FileNotFoundError:
+        return []
@@ -0,0 +1,88 @@
+"""
+Cache of retrieve() responses, kept in memory (LRU) and on disk in .clean_coder/retrieval_cache.json.
+
+Entries are valid only for the index version they were computed with. Version combines stamp of vector database,
+bumped by upload_descriptions_to_vdb, and version of the symbol index; when any of them changes, cache is cleared.
+"""
+import os
+import re
+import json
+import time
+from collections import OrderedDict
+
+
+MAX_ENTRIES = 256
+
+
+def vdb_version_path(work_dir):
+    return os.path.join(work_dir, '.clean_coder', 'vdb_version')
+
+
+def read_vdb_version(work_dir):
+    try:
+        with open(vdb_version_path(work_dir), 'r') as file:
+            return file.read().strip()
+    except FileNotFoundError:
+        return "0"
+
+
+def bump_vdb_version(work_dir):
+    with open(vdb_version_path(work_dir), 'w') as file:
+        file.write(str(time.time_ns()))
+
+
+def normalize_query(query):
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.strip(" .?!\"'")
+
+
+class QueryCache:
+    caches = {}
+
+    def __init__(self, work_dir):
+        self.cache_path = os.path.join(work_dir, '.clean_coder', 'retrieval_cache.json')
+        self.version = None
+        self.entries = OrderedDict()
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as file:
+                stored = json.load(file)
+            self.version = stored["version"]
+            self.entries = OrderedDict(stored["entries"])
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    @staticmethod
+    def for_work_dir(work_dir):
+        if work_dir not in QueryCache.caches:
+            QueryCache.caches[work_dir] = QueryCache(work_dir)
+        return QueryCache.caches[work_dir]
+
+    def get(self, query, version):
+        if version != self.version:
+            # index changed since entries been computed
+            self.version = version
+            self.entries.clear()
+            return None
+        key = normalize_query(query)
+        if key not in self.entries:
+            return None
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def put(self, query, version, response):
+        if version != self.version:
+            self.version = version
+            self.entries.clear()
+        self.entries[normalize_query(query)] = response
+        self.entries.move_to_end(normalize_query(query))
+        while len(self.entries) > MAX_ENTRIES:
+            self.entries.popitem(last=False)
+        self.save()
+
+    def save(self):
+        if not os.path.isdir(os.path.dirname(self.cache_path)):
+            return
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": self.version, "entries": self.entries}, file)
+        os.replace(tmp_path, self.cache_path)
@@ -0,0 +1,99 @@
+"""
+Rerankers ordering documents found in vector database by relevance to the query.
+
+Reranker is chosen with RERANKER env variable: "cohere", "bm25" or "cross-encoder". If not set, Cohere is used when
+COHERE_API_KEY provided, otherwise local BM25 reranker, so retrieval works offline.
+"""
+import os
+import re
+import math
+from collections import Counter
+
+
+class CohereReranker:
+    def __init__(self):
+        import cohere
+        self.client = cohere.Client(os.getenv("COHERE_API_KEY"))
+
+    def rerank(self, query, documents, top_n):
+        reranked_docs = self.client.rerank(
+            query=query,
+            documents=documents,
+            top_n=top_n,
+            model="rerank-english-v3.0",
+        )
+        return [result.index for result in reranked_docs.results]
+
+
+class BM25Reranker:
+    """
+    Scores documents with BM25 and fuses that ranking with the original (vector similarity) order, so documents
+    matching semantically but not sharing words with query are not pushed to the end.
+    """
+    def __init__(self, k1=1.5, b=0.75, rrf_k=10):
+        self.k1 = k1
+        self.b = b
+        self.rrf_k = rrf_k
+
+    def rerank(self, query, documents, top_n):
+        scores = bm25_scores(tokenize(query), [tokenize(document) for document in documents], self.k1, self.b)
+        bm25_order = sorted((i for i in range(len(documents)) if scores[i] > 0), key=lambda i: -scores[i])
+        fused_scores = Counter({i: 1 / (self.rrf_k + i) for i in range(len(documents))})
+        for rank, i in enumerate(bm25_order):
+            fused_scores[i] += 1 / (self.rrf_k + rank)
+        return [i for i, _ in fused_scores.most_common(top_n)]
+
+
+class CrossEncoderReranker:
+    """Small cross-encoder running on CPU. Requires sentence-transformers package."""
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+
+    def rerank(self, query, documents, top_n):
+        scores = self.model.predict([(query, document) for document in documents])
+        return sorted(range(len(documents)), key=lambda i: -scores[i])[:top_n]
+
+
+rerankers = {
+    "cohere": CohereReranker,
+    "bm25": BM25Reranker,
+    "cross-encoder": CrossEncoderReranker,
+}
+
+
+def get_reranker():
+    reranker_name = os.getenv("RERANKER") or ("cohere" if os.getenv("COHERE_API_KEY") else "bm25")
+    return rerankers[reranker_name]()
+
+
+def tokenize(text):
+    """Splits text into lowercase words; identifiers as camelCase or snake_case are split into parts as well."""
+    tokens = []
+    for word in re.findall(r"[A-Za-z0-9]+", text):
+        parts = re.findall(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+", word)
+        tokens.append(word.lower())
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+
+def bm25_scores(query_tokens, documents_tokens, k1=1.5, b=0.75):
+    documents_count = len(documents_tokens)
+    if documents_count == 0:
+        return []
+    average_length = sum(len(tokens) for tokens in documents_tokens) / documents_count or 1
+    document_frequencies = Counter(token for tokens in documents_tokens for token in set(tokens))
+    scores = []
+    for tokens in documents_tokens:
+        term_frequencies = Counter(tokens)
+        score = 0
+        for token in set(query_tokens):
+            if token not in term_frequencies:
+                continue
+            df = document_frequencies[token]
+            idf = math.log(1 + (documents_count - df + 0.5) / (df + 0.5))
+            tf = term_frequencies[token]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / average_length))
+        scores.append(score)
+    return scores
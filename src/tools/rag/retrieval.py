@@ -1,55 +1,201 @@
 import os
-import cohere
-import chromadb
+import sqlite3
+from contextlib import closing
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
+from src.utilities.print_formatters import print_formatted
+from src.tools.rag.rerankers import get_reranker
+from src.tools.rag.symbol_index import SymbolIndex
+from src.tools.rag.query_cache import QueryCache, read_vdb_version
 
 
 load_dotenv(find_dotenv())
 work_dir = os.getenv("WORK_DIR")
-cohere_key = os.getenv("COHERE_API_KEY")
-if cohere_key:
-    cohere_client = cohere.Client(cohere_key)
 collection_name = f"clean_coder_{Path(work_dir).name}_file_descriptions"
+default_embedding_model = "all-MiniLM-L6-v2"
+chunks_collection_name = f"clean_coder_{Path(work_dir).name}_code_chunks"
 
 
-def get_collection():
-    if cohere_key:
-        chroma_client = chromadb.PersistentClient(path=os.getenv('WORK_DIR') + '/.clean_coder/chroma_base')
-        try:
-            return chroma_client.get_collection(name=collection_name)
-        except ValueError:
-            # print("Vector database does not exist. (Optional) create it by running src/tools/rag/write_descriptions.py to improve file research capabilities")
-            return False
-    return False
+def embedding_model():
+    return os.getenv("EMBEDDING_MODEL") or default_embedding_model
 
 
-collection = get_collection()
+def get_embedding_function():
+    """Local embedding function, so documents and queries are embedded without network calls."""
+    from chromadb.utils import embedding_functions
+    model_name = os.getenv("EMBEDDING_MODEL")
+    if model_name:
+        return embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name, device="cpu")
+    # all-MiniLM-L6-v2 run with onnxruntime on CPU
+    return embedding_functions.DefaultEmbeddingFunction()
+
+
+def collection_embedding_model(collection):
+    # collections created before model name was stored were embedded with the default model
+    return (collection.metadata or {}).get("embedding_model", default_embedding_model)
+
+
+class VectorDatabase:
+    """
+    Process-wide handles of Chroma client, collection and reranker, created on first use. Chroma is imported
+    and opened only when semantic query really happens.
+    """
+    client = None
+    # collection name -> collection, or False if it does not exist
+    collections = {}
+    reranker = None
+
+    @staticmethod
+    def path():
+        return os.path.join(work_dir, '.clean_coder', 'chroma_base')
+
+    @staticmethod
+    def get_client():
+        if VectorDatabase.client is None:
+            import chromadb
+            VectorDatabase.client = chromadb.PersistentClient(path=VectorDatabase.path())
+        return VectorDatabase.client
+
+    @staticmethod
+    def get_collection(create=False, name=collection_name):
+        """
+        Returns collection (file descriptions by default) or False if it does not exist or was embedded with other
+        model than EMBEDDING_MODEL. Collection created with create=True is rebuilt empty when embedding model changed.
+        """
+        # collection missing on the last lookup could be created since then, by write_descriptions
+        if name not in VectorDatabase.collections or (create and not VectorDatabase.collections[name]):
+            try:
+                collection = VectorDatabase.get_client().get_collection(
+                    name=name, embedding_function=get_embedding_function()
+                )
+            except ValueError:
+                # print("Vector database does not exist. (Optional) create it by running src/tools/rag/write_descriptions.py to improve file research capabilities")
+                collection = False
+            if collection and collection_embedding_model(collection) != embedding_model():
+                message = (
+                    f"Collection {name} was embedded with {collection_embedding_model(collection)}, "
+                    f"not {embedding_model()}"
+                )
+                if create:
+                    print_formatted(f"{message}; rebuilding it.", color="yellow")
+                    VectorDatabase.get_client().delete_collection(name=name)
+                else:
+                    print_formatted(
+                        f"{message}; run src/tools/rag/write_descriptions.py to rebuild it.", color="yellow"
+                    )
+                collection = False
+            if create and not collection:
+                collection = VectorDatabase.get_client().create_collection(
+                    name=name,
+                    embedding_function=get_embedding_function(),
+                    metadata={"embedding_model": embedding_model()},
+                )
+            VectorDatabase.collections[name] = collection
+        return VectorDatabase.collections[name]
+
+    @staticmethod
+    def get_chunks_collection(create=False):
+        """Returns collection of code chunks (functions, classes, sections) with their line ranges."""
+        return VectorDatabase.get_collection(create=create, name=chunks_collection_name)
+
+    @staticmethod
+    def get_reranker():
+        if VectorDatabase.reranker is None:
+            VectorDatabase.reranker = get_reranker()
+        return VectorDatabase.reranker
 
 
 def vdb_available():
-    return True if get_collection() else False
+    """Tells if collection of file descriptions exists."""
+    if collection_name in VectorDatabase.collections:
+        return bool(VectorDatabase.collections[collection_name])
+    database_path = os.path.join(VectorDatabase.path(), 'chroma.sqlite3')
+    if not os.path.isfile(database_path):
+        return False
+    # collection is looked up in Chroma's sqlite file directly; opening Chroma is postponed to the first query
+    try:
+        with closing(sqlite3.connect(f"file:{database_path}?mode=ro", uri=True)) as connection:
+            row = connection.execute("SELECT 1 FROM collections WHERE name = ?", (collection_name,)).fetchone()
+        return row is not None
+    except sqlite3.Error:
+        # unknown layout of Chroma's database
+        return bool(VectorDatabase.get_collection())
+
+
+def retrieval_available():
+    return vdb_available() or SymbolIndex.exists(work_dir)
 
 
 def retrieve(question):
-    retrieval = collection.query(query_texts=[question], n_results=8)
-    reranked_docs = cohere_client.rerank(
-        query=question,
-        documents=retrieval["documents"][0],
-        top_n=4,
-        model="rerank-english-v3.0",
-        #return_documents=True,
-    )
-    reranked_indexes = [result.index for result in reranked_docs.results]
+    symbol_index = SymbolIndex.get(work_dir)
+    index_version = f"{read_vdb_version(work_dir)}:{symbol_index.version}"
+    query_cache = QueryCache.for_work_dir(work_dir)
+    cached_response = query_cache.get(question, index_version)
+    if cached_response is not None:
+        return cached_response
+    response = search_index(question, symbol_index)
+    query_cache.put(question, index_version, response)
+    return response
+
+
+def search_index(question, symbol_index):
+    # files found by descriptions in vector database
+    descriptions = {}
+    collection = VectorDatabase.get_collection() if vdb_available() else False
+    if collection:
+        retrieval = collection.query(query_texts=[question], n_results=8)
+        reranked_indexes = VectorDatabase.get_reranker().rerank(question, retrieval["documents"][0], top_n=4)
+        for index in reranked_indexes:
+            descriptions[retrieval["ids"][0][index]] = retrieval["documents"][0][index]
+    # files and their regions found by embedded code chunks
+    line_ranges = search_code_chunks(question) if collection else {}
+    # files found by exact names of identifiers, routes and paths
+    matched_symbols = dict(symbol_index.search(question))
+
+    filenames = reciprocal_rank_fusion([list(descriptions), list(line_ranges), list(matched_symbols)])[:6]
+    missing_descriptions = [filename for filename in filenames if filename not in descriptions]
+    if collection and missing_descriptions:
+        stored = collection.get(ids=missing_descriptions)
+        descriptions.update(zip(stored["ids"], stored["documents"]))
+
     response = ""
-    for index in reranked_indexes:
-        filename = retrieval["ids"][0][index]
-        description = retrieval["documents"][0][index]
-        response += f"{filename}:\n\n{description}\n\n"
+    for filename in filenames:
+        response += f"{filename}:\n\n"
+        if filename in descriptions:
+            response += f"{descriptions[filename]}\n"
+        if line_ranges.get(filename):
+            ranges = ', '.join(f"{start}-{end}" for start, end in line_ranges[filename])
+            response += f"Relevant lines: {ranges}\n"
+        if matched_symbols.get(filename):
+            response += f"Matching names: {', '.join(matched_symbols[filename])}\n"
+        response += "\n"
     response += "\n\nRemember to see files before adding to final response!"
 
     return response
 
+
+def search_code_chunks(question, n_results=10):
+    """Returns dict of file path -> list of (start line, end line) of matching chunks, ordered by relevance."""
+    chunks_collection = VectorDatabase.get_chunks_collection()
+    if not chunks_collection:
+        return {}
+    retrieval = chunks_collection.query(query_texts=[question], n_results=n_results, include=["metadatas"])
+    line_ranges = {}
+    for metadata in retrieval["metadatas"][0]:
+        ranges = line_ranges.setdefault(metadata["path"], [])
+        if len(ranges) < 3:
+            ranges.append((metadata["start_line"], metadata["end_line"]))
+    return {path: sorted(ranges) for path, ranges in line_ranges.items()}
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0) + 1 / (k + rank)
+    return sorted(scores, key=lambda item: -scores[item])
+
+
 if __name__ == "__main__":
     question = "Common styles, used in the main page"
     results = retrieve(question)
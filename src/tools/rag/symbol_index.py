@@ -0,0 +1,178 @@
+"""
+Persistent inverted index of identifiers, routes and file paths of the project.
+
+Complements vector search over file descriptions: exact names like endpoint paths or component names are often not
+mentioned in descriptions. Index is stored in .clean_coder/symbol_index.json and updated incrementally - only files
+with changed mtime or size are re-read.
+"""
+import os
+import re
+import json
+import math
+from collections import defaultdict
+from pathlib import Path
+from src.tools.rag.project_files import list_code_files, is_code_file
+from src.tools.rag.rerankers import tokenize
+from src.utilities.file_watcher import FileWatcher
+
+
+definition_pattern = re.compile(
+    r"\b(?:def|class|function|interface|type|enum|struct|trait|fn|func|module)\s+([A-Za-z_$][\w$]*)"
+    r"|\b(?:const|let|var)\s+([A-Za-z_$][\w$]*)\s*[=:]"
+    r"|^\s*(?:export\s+)?(?:async\s+)?([A-Za-z_$][\w$]*)\s*\([^)\n]*\)\s*\{",
+    re.MULTILINE,
+)
+route_pattern = re.compile(r"""['"`](/[\w\-.:{}<>$/]*[\w}>])['"`]""")
+component_pattern = re.compile(r"<([A-Z][\w]*)[\s/>]")
+identifier_pattern = re.compile(r"[A-Za-z_$][\w$]*|/[\w\-./:{}<>$]+")
+
+not_identifiers = {"if", "for", "while", "switch", "catch", "return", "function", "constructor"}
+
+
+def extract_symbols(content):
+    symbols = set()
+    for match in definition_pattern.finditer(content):
+        name = next(group for group in match.groups() if group)
+        if name not in not_identifiers:
+            symbols.add(name)
+    symbols.update(component_pattern.findall(content))
+    routes = set(route_pattern.findall(content))
+    return sorted(symbols), sorted(routes)
+
+
+class SymbolIndex:
+    indexes = {}
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.index_path = os.path.join(work_dir, '.clean_coder', 'symbol_index.json')
+        # rel path -> {"mtime_ns", "size", "symbols", "routes"}
+        self.files = {}
+        self.postings = None
+        self.version = 0
+        self.watcher_generation = 0
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as file:
+                stored = json.load(file)
+            self.files = stored["files"]
+            self.version = stored.get("version", 0)
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    @staticmethod
+    def get(work_dir):
+        """Returns index for work dir, brought up to date on first use in the process."""
+        if work_dir not in SymbolIndex.indexes:
+            index = SymbolIndex(work_dir)
+            index.update()
+            SymbolIndex.indexes[work_dir] = index
+        elif FileWatcher.running():
+            SymbolIndex.indexes[work_dir].update_changed_by_watcher()
+        return SymbolIndex.indexes[work_dir]
+
+    @staticmethod
+    def exists(work_dir):
+        index_path = os.path.join(work_dir, '.clean_coder', 'symbol_index.json')
+        return work_dir in SymbolIndex.indexes or os.path.exists(index_path)
+
+    def update(self, file_paths=None):
+        """Re-indexes new and modified files. If file_paths not provided, whole project is checked."""
+        full_check = file_paths is None
+        if full_check:
+            self.watcher_generation = FileWatcher.current_generation()
+            file_paths = list_code_files(self.work_dir)
+        changed = False
+        seen = set()
+        for file_path in file_paths:
+            rel_path = os.path.relpath(file_path, self.work_dir).replace(os.sep, '/')
+            seen.add(rel_path)
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                changed |= self.files.pop(rel_path, None) is not None
+                continue
+            entry = self.files.get(rel_path)
+            if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                continue
+            try:
+                with open(file_path, 'r', encoding='utf-8') as file:
+                    symbols, routes = extract_symbols(file.read())
+            except (OSError, UnicodeDecodeError):
+                continue
+            self.files[rel_path] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "symbols": symbols, "routes": routes}
+            changed = True
+        if full_check:
+            for rel_path in [rel_path for rel_path in self.files if rel_path not in seen]:
+                del self.files[rel_path]
+                changed = True
+        if changed:
+            self.version += 1
+            self.postings = None
+            self.save()
+
+    def update_changed_by_watcher(self):
+        changed_code_paths = [
+            path for path, generation in list(FileWatcher.changes.items())
+            if generation > self.watcher_generation and is_code_file(Path(path))
+        ]
+        self.watcher_generation = FileWatcher.current_generation()
+        if changed_code_paths:
+            self.update(changed_code_paths)
+
+    def save(self):
+        if not os.path.isdir(os.path.dirname(self.index_path)):
+            return
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": self.version, "files": self.files}, file)
+        os.replace(tmp_path, self.index_path)
+
+    def build_postings(self):
+        # token -> {rel path -> weight}; whole identifiers and routes weight more than their parts
+        self.postings = defaultdict(lambda: defaultdict(float))
+        for rel_path, entry in self.files.items():
+            for symbol in entry["symbols"]:
+                self.postings[symbol.lower()][rel_path] += 3
+                for token in tokenize(symbol):
+                    self.postings[token][rel_path] += 1
+            for route in entry["routes"]:
+                self.postings[route.lower()][rel_path] += 3
+                # query can contain only beginning of route, like /api/users for /api/users/{user_id}
+                segments = route.lower().split('/')
+                for i in range(2, len(segments)):
+                    self.postings['/'.join(segments[:i])][rel_path] += 1
+                for token in tokenize(route):
+                    self.postings[token][rel_path] += 0.5
+            path_parts = rel_path.lower().split('/')
+            self.postings[path_parts[-1].rsplit('.', 1)[0]][rel_path] += 2
+            for part in path_parts:
+                for token in tokenize(part):
+                    self.postings[token][rel_path] += 1
+
+    def search(self, query, top_n=8):
+        """Returns list of (rel path, matched symbols) sorted by relevance."""
+        if self.postings is None:
+            self.build_postings()
+        raw_terms = {term.lower() for term in identifier_pattern.findall(query)}
+        terms = raw_terms | set(tokenize(query))
+        scores = defaultdict(float)
+        matched = defaultdict(set)
+        files_count = len(self.files) or 1
+        for term in terms:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + files_count / len(postings))
+            for rel_path, weight in postings.items():
+                scores[rel_path] += weight * idf
+                if term in raw_terms:
+                    matched[rel_path].add(term)
+        ranked = sorted(scores, key=lambda rel_path: -scores[rel_path])[:top_n]
+        return [(rel_path, self.matched_symbols(rel_path, matched[rel_path])) for rel_path in ranked]
+
+    def matched_symbols(self, rel_path, terms):
+        entry = self.files.get(rel_path, {})
+        return [
+            name for name in entry.get("symbols", []) + entry.get("routes", [])
+            if name.lower() in terms or any(name.lower().startswith(term + '/') for term in terms if term.startswith('/'))
+        ]
@@ -1,27 +1,33 @@
 import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from langchain_openai import ChatOpenAI
 from dotenv import load_dotenv, find_dotenv
-import chromadb
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..')))
 from src.utilities.util_functions import join_paths
 from src.utilities.llms import init_llms_mini
+from src.utilities.file_watcher import FileWatcher
+from src.utilities.print_formatters import print_formatted
+from src.tools.rag.retrieval import VectorDatabase
+from src.tools.rag.project_files import list_code_files
+from src.tools.rag.symbol_index import SymbolIndex
+from src.tools.rag.code_chunks import split_into_chunks
+from src.tools.rag.query_cache import bump_vdb_version
 
 
 load_dotenv(find_dotenv())
 work_dir = os.getenv("WORK_DIR")
-
-
-def is_code_file(file_path):
-    # List of common code file extensions
-    code_extensions = {
-        '.js', '.jsx', '.ts', '.tsx', '.vue', '.py', '.rb', '.php', '.java', '.c', '.cpp', '.cs', '.go', '.swift',
-        '.kt', '.rs', '.htm','.html', '.css', '.scss', '.sass', '.less', '.prompt',
-    }
-    return file_path.suffix.lower() in code_extensions
+# default limits of requests per minute for providers of mini models; 0 means no limit
+default_requests_per_minute = {"ChatAnthropic": 50, "ChatOpenAI": 500}
+manifest_save_interval = 20
 
 
 # read file content. place name of file in the top
@@ -32,15 +38,77 @@ def get_content(file_path):
     return content
 
 
-def write_descriptions(subfolders_with_files=['/']):
-    all_files = []
+def file_hash(file_path):
+    if FileWatcher.watches(file_path):
+        return FileWatcher.file_hash(file_path)
+    with open(file_path, 'rb') as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def description_path(rel_path):
+    file_name = rel_path.replace('/', '=')
+    return join_paths(work_dir, '.clean_coder/files_and_folders_descriptions', f"{file_name}.txt")
+
+
+def in_folders(path, folders):
+    # compared by path components, so "src/app" does not contain "src/app_old/file.py"
+    return any(os.path.commonpath([path, folder]) == folder for folder in folders)
+
+
+def manifest_path():
+    return join_paths(work_dir, '.clean_coder/descriptions_manifest.json')
+
+
+def load_manifest():
+    """Manifest maps every described file to hash of its content and description written for it."""
+    try:
+        with open(manifest_path(), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest):
+    tmp_path = manifest_path() + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=1)
+    os.replace(tmp_path, manifest_path())
+
+
+def write_descriptions(subfolders_with_files=['/'], concurrency=8, requests_per_minute=None):
+    all_files = list_code_files(work_dir, subfolders_with_files)
+
+    description_folder = join_paths(work_dir, '.clean_coder/files_and_folders_descriptions')
+    Path(description_folder).mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest()
+
+    # describe only new and modified files
+    files_to_describe = []
+    hashes = {}
+    for file_path in all_files:
+        rel_path = file_path.relative_to(work_dir).as_posix()
+        hashes[rel_path] = file_hash(file_path)
+        if rel_path not in manifest and os.path.exists(description_path(rel_path)) \
+                and os.path.getmtime(description_path(rel_path)) > os.path.getmtime(file_path):
+            # description written before manifest existed, but after last change of file
+            with open(description_path(rel_path), 'r', encoding='utf-8') as file:
+                manifest[rel_path] = {"hash": hashes[rel_path], "description": file.read()}
+        if manifest.get(rel_path, {}).get("hash") != hashes[rel_path]:
+            files_to_describe.append(file_path)
 
-    for folder in subfolders_with_files:
-        for root, _, files in os.walk(work_dir + folder):
-            for file in files:
-                file_path = Path(root) / file
-                if is_code_file(file_path):
-                    all_files.append(file_path)
+    # remove descriptions of deleted files
+    described_folders = [join_paths(work_dir, folder) for folder in subfolders_with_files]
+    for rel_path in list(manifest):
+        if rel_path in hashes:
+            continue
+        if in_folders(join_paths(work_dir, rel_path), described_folders):
+            del manifest[rel_path]
+            if os.path.exists(description_path(rel_path)):
+                os.remove(description_path(rel_path))
+    save_manifest(manifest)
+    print(f"{len(files_to_describe)} of {len(all_files)} files need to be described.")
+    if not files_to_describe:
+        return
 
     prompt = ChatPromptTemplate.from_template(
 """Describe the following code in 4 sentences or less, focusing only on important information from integration point of view.
@@ -50,45 +118,175 @@ Write what file is responsible for.\n\n'''\n{code}'''
     llms = init_llms_mini(tools=[], run_name='File Describer')
     llm = llms[0]
     chain = prompt | llm | StrOutputParser()
+    provider = llm.bound.__class__.__name__
+    requests_per_minute = requests_per_minute or int(
+        os.getenv("DESCRIPTIONS_REQUESTS_PER_MINUTE") or default_requests_per_minute.get(provider, 0)
+    )
+    rate_limiter = TokenBucket(requests_per_minute / 60, capacity=concurrency) if requests_per_minute else None
 
-    description_folder = join_paths(work_dir, '.clean_coder/files_and_folders_descriptions')
-    Path(description_folder).mkdir(parents=True, exist_ok=True)
-    # iterate over all files, take 8 files at once
-    batch_size = 8
-    for i in range(0, len(all_files), batch_size):
-        files_iteration = all_files[i:i + batch_size]
-        descriptions = chain.batch([get_content(file_path) for file_path in files_iteration])
-        print(descriptions)
+    # descriptions are written to disk as soon as they are ready; manifest is saved periodically, and descriptions
+    # not saved in manifest because of interruption are picked up on the next run as written after file change
+    described_count = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(describe_file, chain, file_path, rate_limiter): file_path for file_path in files_to_describe
+        }
+        try:
+            for future in as_completed(futures):
+                file_path = futures[future]
+                rel_path = file_path.relative_to(work_dir).as_posix()
+                try:
+                    description = future.result()
+                except Exception as e:
+                    print_formatted(f"Failed to describe {rel_path}: {type(e).__name__}: {e}", color="red")
+                    continue
+                with open(description_path(rel_path), 'w', encoding='utf-8') as out_file:
+                    out_file.write(description)
+                manifest[rel_path] = {"hash": hashes[rel_path], "description": description}
+                described_count += 1
+                print(f"[{described_count}/{len(files_to_describe)}] {rel_path}: {description}")
+                if described_count % manifest_save_interval == 0:
+                    save_manifest(manifest)
+        finally:
+            for future in futures:
+                future.cancel()
+            save_manifest(manifest)
 
-        for file_path, description in zip(files_iteration, descriptions):
-            file_name = file_path.relative_to(work_dir).as_posix().replace('/', '=')
-            output_path = join_paths(description_folder, f"{file_name}.txt")
 
-            with open(output_path, 'w', encoding='utf-8') as out_file:
-                out_file.write(description)
+def describe_file(chain, file_path, rate_limiter, max_retries=5):
+    content = get_content(file_path)
+    for attempt in range(max_retries + 1):
+        if rate_limiter:
+            rate_limiter.acquire()
+        try:
+            return chain.invoke(content)
+        except Exception as e:
+            if attempt == max_retries or not is_retryable_error(e):
+                raise
+            # exponential backoff with jitter, to not hit the limit by all workers at the same time again
+            time.sleep(min(2 ** attempt, 60) + random.uniform(0, 1))
 
 
-def upload_descriptions_to_vdb():
-    chroma_client = chromadb.PersistentClient(path=join_paths(work_dir, '.clean_coder/chroma_base'))
-    collection_name = f"clean_coder_{Path(work_dir).name}_file_descriptions"
+def is_retryable_error(error):
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status_code is None:
+        return type(error).__name__ in ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError")
+    return status_code == 429 or status_code >= 500
 
-    collection = chroma_client.get_or_create_collection(
-        name=collection_name
-    )
 
-    # read files and upload to base
+class TokenBucket:
+    """Thread-safe token bucket limiting number of requests per second sent to the provider."""
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+                self.last_refill = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.rate
+            time.sleep(wait_time)
+
+
+def upload_descriptions_to_vdb(batch_size=64):
+    collection = VectorDatabase.get_collection(create=True)
+    stored = collection.get(include=["metadatas"])
+    stored_hashes = {
+        doc_id: (metadata or {}).get("content_hash") for doc_id, metadata in zip(stored["ids"], stored["metadatas"])
+    }
+
+    # read files and collect ones not uploaded yet or changed
     description_folder = join_paths(work_dir, '.clean_coder/files_and_folders_descriptions')
+    ids, documents, metadatas = [], [], []
+    existing_ids = set()
     for root, _, files in os.walk(description_folder):
         for file in files:
             file_path = Path(root) / file
+            doc_id = file_path.name.replace('=', '/').removesuffix(".txt")
+            existing_ids.add(doc_id)
             with open(file_path, 'r', encoding='utf-8') as file:
                 content = file.read()
-            collection.upsert(
-                documents=[
-                    content
-                ],
-                ids=[file_path.name.replace('=', '/').removesuffix(".txt")],
-            )
+            content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
+            if stored_hashes.get(doc_id) == content_hash:
+                continue
+            ids.append(doc_id)
+            documents.append(content)
+            metadatas.append({"content_hash": content_hash})
+
+    # embed and upload in chunks
+    for i in range(0, len(ids), batch_size):
+        collection.upsert(
+            documents=documents[i:i + batch_size],
+            ids=ids[i:i + batch_size],
+            metadatas=metadatas[i:i + batch_size],
+        )
+
+    removed_ids = [doc_id for doc_id in stored_hashes if doc_id not in existing_ids]
+    if removed_ids:
+        collection.delete(ids=removed_ids)
+    if ids or removed_ids:
+        # invalidates cached retrieval results
+        bump_vdb_version(work_dir)
+    print(f"Uploaded {len(ids)} descriptions, removed {len(removed_ids)}.")
+
+
+def upload_code_chunks_to_vdb(subfolders_with_files=['/'], batch_size=64):
+    """Embeds functions, classes and sections of code files with their line ranges. Only changed files are re-chunked."""
+    collection = VectorDatabase.get_chunks_collection(create=True)
+    stored = collection.get(include=["metadatas"])
+    # file path -> (file hash, ids of its chunks)
+    stored_files = {}
+    for chunk_id, metadata in zip(stored["ids"], stored["metadatas"]):
+        stored_file = stored_files.setdefault(metadata["path"], (metadata["file_hash"], []))
+        stored_file[1].append(chunk_id)
+
+    ids, documents, metadatas = [], [], []
+    outdated_ids = []
+    existing_paths = set()
+    for file_path in list_code_files(work_dir, subfolders_with_files):
+        rel_path = file_path.relative_to(work_dir).as_posix()
+        existing_paths.add(rel_path)
+        current_hash = file_hash(file_path)
+        stored_hash, stored_ids = stored_files.get(rel_path, (None, []))
+        if stored_hash == current_hash:
+            continue
+        outdated_ids.extend(stored_ids)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as file:
+                content = file.read()
+        except UnicodeDecodeError:
+            continue
+        for chunk in split_into_chunks(content, rel_path):
+            ids.append(f"{rel_path}:{chunk.start_line}-{chunk.end_line}")
+            documents.append(chunk.text)
+            metadatas.append({
+                "path": rel_path, "start_line": chunk.start_line, "end_line": chunk.end_line, "file_hash": current_hash
+            })
+    described_folders = [join_paths(work_dir, folder) for folder in subfolders_with_files]
+    for rel_path, (_, stored_ids) in stored_files.items():
+        if rel_path not in existing_paths \
+                and in_folders(join_paths(work_dir, rel_path), described_folders):
+            outdated_ids.extend(stored_ids)
+
+    if outdated_ids:
+        collection.delete(ids=outdated_ids)
+    for i in range(0, len(ids), batch_size):
+        collection.upsert(
+            documents=documents[i:i + batch_size],
+            ids=ids[i:i + batch_size],
+            metadatas=metadatas[i:i + batch_size],
+        )
+    if ids or outdated_ids:
+        bump_vdb_version(work_dir)
+    print(f"Uploaded {len(ids)} code chunks, removed {len(outdated_ids)}.")
 
 
 if __name__ == '__main__':
@@ -96,3 +294,7 @@ if __name__ == '__main__':
     write_descriptions(subfolders_with_files=['/'])
 
     upload_descriptions_to_vdb()
+    # embedding of functions and classes lets retrieval point to relevant lines of big files
+    if os.getenv("INDEX_CODE_CHUNKS", "").lower() in ("1", "true", "yes"):
+        upload_code_chunks_to_vdb(subfolders_with_files=['/'])
+    SymbolIndex.get(work_dir)
@@ -2,12 +2,17 @@ from langchain.tools import tool
 import os
 from playwright.sync_api import sync_playwright
 from dotenv import load_dotenv, find_dotenv
-from src.utilities.syntax_checker_functions import check_syntax
+from src.utilities.incremental_syntax_checker import check_edit_syntax
 from src.utilities.start_work_functions import file_folder_ignored, CoderIgnore
 from src.utilities.util_functions import join_paths, TOOL_NOT_EXECUTED_WORD
 from src.utilities.user_input import user_input
+from src.utilities.edit_engine import apply_line_edits, find_snippet, reindent, FileChangedError, EditError
+from src.utilities.approval_queue import read_snapshot, projected_version, submit_changes
+from src.utilities.file_outline import file_outline
 from src.tools.rag.retrieval import retrieve
 import base64
+import json
+import re
 
 
 load_dotenv(find_dotenv())
@@ -24,6 +29,16 @@ Changes can cause next error: {error_response}. Probably you:
 - Forgot to add an indents on beginning of code.
 Think step by step which function/code block you want to change before proposing improved change.
 """
+syntax_error_apply_edits = """
+None of edits been applied, as changes can cause next errors:
+{error_response}
+Probably you provided wrong line numbers (remember that all of them refer to file contents before any of edits)
+or forgot to add an indents on beginning of code. Correct the edits and call tool again with all of them.
+"""
+file_changed_during_edit = """
+File has been changed by someone else while waiting for approval, so changes were not applied: {error_response}
+See the file again and propose changes to its current version.
+"""
 
 
 def prepare_list_dir_tool(work_dir):
@@ -48,20 +63,26 @@ tool input:
 
 def prepare_see_file_tool(work_dir):
     @tool
-    def see_file(filename):
+    def see_file(filename, line_range=None):
         """
 Check contents of file.
 tool input:
 :param filename: Name and path of file to check.
+:param line_range: (optional) Range of lines to show, like "120-180", or single line. Use it for big files, when only
+some region (for example pointed as relevant lines by retrieval) is needed.
 """
         try:
             if file_folder_ignored(filename, CoderIgnore.get_forbidden()):
                 return f"You are not allowed to work with {filename}."
-            with open(join_paths(work_dir, filename), 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-            formatted_lines = [f"{i+1}|{line[:-1]}\n" for i, line in enumerate(lines)]
-            file_content = "".join(formatted_lines)
-            file_content = filename + ":\n\n" + file_content
+            snapshot = read_snapshot(join_paths(work_dir, filename))
+            if line_range:
+                lines = parse_line_range(line_range)
+                if lines is None:
+                    return f"line_range should be like \"120-180\" or a single line number, not {line_range!r}."
+                start_line, end_line = lines
+                return f"{filename} (lines {start_line}-{end_line} of {len(snapshot.lines)}):\n\n" \
+                    + snapshot.render_region(start_line, end_line)
+            file_content = filename + ":\n\n" + snapshot.render(line_numbers=True)
 
             return file_content
         except Exception as e:
@@ -70,11 +91,44 @@ tool input:
     return see_file
 
 
+def parse_line_range(line_range):
+    """Returns (start line, end line) from "120-180", "120" or [120, 180], or None if it is not a range."""
+    if isinstance(line_range, (list, tuple)):
+        line_range = "-".join(str(number) for number in line_range)
+    match = re.fullmatch(r"\s*(\d+)\s*(?:[-:–]\s*(\d+)\s*)?", str(line_range))
+    if not match:
+        return None
+    start_line = int(match.group(1))
+    end_line = int(match.group(2)) if match.group(2) else start_line
+    return (start_line, end_line) if start_line <= end_line else None
+
+
+def prepare_see_file_outline_tool(work_dir):
+    @tool
+    def see_file_outline(filename):
+        """
+Check outline of file - classes, functions and methods defined in it with their line ranges - without reading whole
+file. Use it for big files, and next check only needed part of them with see_file and its line_range.
+tool input:
+:param filename: Name and path of file to check.
+"""
+        try:
+            if file_folder_ignored(filename, CoderIgnore.get_forbidden()):
+                return f"You are not allowed to work with {filename}."
+            snapshot = read_snapshot(join_paths(work_dir, filename))
+            return file_outline(filename, "".join(snapshot.lines))
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    return see_file_outline
+
+
 @tool
 def retrieve_files_by_semantic_query(query):
     """
 Use that function to find files or folders in the app by text search.
 You can search for example for common styles, endpoint with user data, etc.
+Exact names, like component names or endpoint paths, are matched too.
 Useful, when you know what do you look for, but don't know where.
 
 Use that function at least once BEFORE calling final response to ensure you found all appropriate files.
@@ -98,21 +152,25 @@ tool input:
 :param code: Code to insert into the file. Without backticks around. Start it with appropriate indentation if needed.
 """
         try:
-            with open(join_paths(work_dir, filename), 'r+', encoding='utf-8') as file:
-                file_contents = file.readlines()
-                file_contents.insert(start_line, code + '\n')
-                file_contents = "".join(file_contents)
-                check_syntax_response = check_syntax(file_contents, filename)
-                if check_syntax_response != "Valid syntax":
-                    print("Wrong syntax provided, asking to correct.")
-                    return TOOL_NOT_EXECUTED_WORD + syntax_error_insert_code.format(error_response=check_syntax_response)
-                human_message = user_input("Never accept changes you don't understand. Type (o)k if you accept or provide commentary.")
-                if human_message not in ['o', 'ok']:
-                    return TOOL_NOT_EXECUTED_WORD + f"Action wasn't executed because of human interruption. He said: {human_message}"
-                file.seek(0)
-                file.truncate()
-                file.write(file_contents)
-            return "Code inserted."
+            full_path = join_paths(work_dir, filename)
+            snapshot = read_snapshot(full_path)
+            file_contents = list(snapshot.lines)
+            file_contents.insert(start_line, code + '\n')
+            file_contents = "".join(file_contents)
+            check_syntax_response = check_edit_syntax(
+                file_contents, filename, snapshot, start_line, start_line, code + '\n'
+            )
+            if check_syntax_response != "Valid syntax":
+                print("Wrong syntax provided, asking to correct.")
+                return TOOL_NOT_EXECUTED_WORD + syntax_error_insert_code.format(error_response=check_syntax_response)
+            status, message = submit_changes(
+                {full_path: (file_contents, snapshot.content_hash)}, f"Insert code after line {start_line} of {filename}"
+            )
+            if status == "rejected":
+                return TOOL_NOT_EXECUTED_WORD + message
+            return "Code inserted." + message
+        except FileChangedError as e:
+            return TOOL_NOT_EXECUTED_WORD + file_changed_during_edit.format(error_response=e)
         except Exception as e:
             return f"{type(e).__name__}: {e}"
 
@@ -132,27 +190,113 @@ tool input:
 :param end_line: End line number to replace with new code. Inclusive - means end_line will be last line to change.
 """
         try:
-            with open(join_paths(work_dir, filename), 'r+', encoding='utf-8') as file:
-                file_contents = file.readlines()
-                file_contents[start_line - 1:end_line] = [code + '\n']
-                file_contents = "".join(file_contents)
-                check_syntax_response = check_syntax(file_contents, filename)
-                if check_syntax_response != "Valid syntax":
-                    print(check_syntax_response)
-                    return TOOL_NOT_EXECUTED_WORD + syntax_error_modify_code.format(error_response=check_syntax_response)
-                human_message = user_input("Never accept changes you don't understand. Type (o)k if you accept or provide commentary.")
-                if human_message not in ['o', 'ok']:
-                    return TOOL_NOT_EXECUTED_WORD + f"Action wasn't executed because of human interruption. He said: {human_message}"
-                file.seek(0)
-                file.truncate()
-                file.write(file_contents)
-            return "Code modified."
+            full_path = join_paths(work_dir, filename)
+            snapshot = read_snapshot(full_path)
+            file_contents = list(snapshot.lines)
+            file_contents[start_line - 1:end_line] = [code + '\n']
+            file_contents = "".join(file_contents)
+            check_syntax_response = check_edit_syntax(
+                file_contents, filename, snapshot, start_line - 1, end_line, code + '\n'
+            )
+            if check_syntax_response != "Valid syntax":
+                print(check_syntax_response)
+                return TOOL_NOT_EXECUTED_WORD + syntax_error_modify_code.format(error_response=check_syntax_response)
+            status, message = submit_changes(
+                {full_path: (file_contents, snapshot.content_hash)}, f"Replace lines {start_line}-{end_line} of {filename}"
+            )
+            if status == "rejected":
+                return TOOL_NOT_EXECUTED_WORD + message
+            return "Code modified." + message
+        except FileChangedError as e:
+            return TOOL_NOT_EXECUTED_WORD + file_changed_during_edit.format(error_response=e)
         except Exception as e:
             return f"{type(e).__name__}: {e}"
 
     return replace_code
 
 
+def prepare_replace_snippet_tool(work_dir):
+    @tool
+    def replace_snippet(filename, old_snippet, code):
+        """
+Replace piece of code found by its text with new one. Use when you're not sure about exact line numbers.
+tool input:
+:param filename: Name and path of file to change.
+:param old_snippet: Complete lines of code to replace, copied from the file. Must be unique in file - if it's not,
+include more lines around. Differences in whitespace are tolerated.
+:param code: New piece of code to replace old one. Without backticks around. Start it with appropriate indentation if needed.
+"""
+        try:
+            full_path = join_paths(work_dir, filename)
+            snapshot = read_snapshot(full_path)
+            start, end = find_snippet(snapshot.lines, old_snippet, filename)
+            file_contents = list(snapshot.lines)
+            new_code = reindent(code, old_snippet, snapshot.lines[start:end]) + '\n'
+            file_contents[start:end] = [new_code]
+            file_contents = "".join(file_contents)
+            check_syntax_response = check_edit_syntax(file_contents, filename, snapshot, start, end, new_code)
+            if check_syntax_response != "Valid syntax":
+                print(check_syntax_response)
+                return TOOL_NOT_EXECUTED_WORD + syntax_error_modify_code.format(error_response=check_syntax_response)
+            status, message = submit_changes(
+                {full_path: (file_contents, snapshot.content_hash)}, f"Replace lines {start + 1}-{end} of {filename}"
+            )
+            if status == "rejected":
+                return TOOL_NOT_EXECUTED_WORD + message
+            return f"Code on lines {start + 1}-{end} modified." + message
+        except EditError as e:
+            return TOOL_NOT_EXECUTED_WORD + str(e)
+        except FileChangedError as e:
+            return TOOL_NOT_EXECUTED_WORD + file_changed_during_edit.format(error_response=e)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    return replace_snippet
+
+
+def prepare_insert_after_snippet_tool(work_dir):
+    @tool
+    def insert_after_snippet(filename, anchor_snippet, code):
+        """
+Insert new piece of code after lines found by their text. Use when you're not sure about exact line numbers.
+tool input:
+:param filename: Name and path of file to change.
+:param anchor_snippet: Complete line(s) of code after which new code goes, copied from the file. Must be unique in
+file - if it's not, include more lines before. Differences in whitespace are tolerated.
+:param code: Code to insert into the file. Without backticks around. Start it with appropriate indentation if needed.
+"""
+        try:
+            full_path = join_paths(work_dir, filename)
+            snapshot = read_snapshot(full_path)
+            _, end = find_snippet(snapshot.lines, anchor_snippet, filename)
+            file_contents = list(snapshot.lines)
+            # edited region starts at the anchor's last line if newline has to be added to it
+            region_start, new_region = end, code + '\n'
+            if end == len(file_contents) and not file_contents[-1].endswith('\n'):
+                file_contents[-1] += '\n'
+                region_start, new_region = end - 1, file_contents[-1] + new_region
+            file_contents.insert(end, code + '\n')
+            file_contents = "".join(file_contents)
+            check_syntax_response = check_edit_syntax(file_contents, filename, snapshot, region_start, end, new_region)
+            if check_syntax_response != "Valid syntax":
+                print("Wrong syntax provided, asking to correct.")
+                return TOOL_NOT_EXECUTED_WORD + syntax_error_insert_code.format(error_response=check_syntax_response)
+            status, message = submit_changes(
+                {full_path: (file_contents, snapshot.content_hash)}, f"Insert code after line {end} of {filename}"
+            )
+            if status == "rejected":
+                return TOOL_NOT_EXECUTED_WORD + message
+            return f"Code inserted after line {end}." + message
+        except EditError as e:
+            return TOOL_NOT_EXECUTED_WORD + str(e)
+        except FileChangedError as e:
+            return TOOL_NOT_EXECUTED_WORD + file_changed_during_edit.format(error_response=e)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    return insert_after_snippet
+
+
 def prepare_create_file_tool(work_dir):
     @tool
     def create_file_with_code(filename, code):
@@ -166,24 +310,84 @@ tool input:
 :param code: Code to write in the file.
 """
         try:
-            human_message = user_input("Never accept changes you don't understand. Type (o)k if you accept or provide commentary.")
-            if human_message not in ['o', 'ok']:
-                return TOOL_NOT_EXECUTED_WORD + f"Action wasn't executed because of human interruption. He said: {human_message}"
-
             full_path = join_paths(work_dir, filename)
-            directory = os.path.dirname(full_path)
+            # directories in path are created if they don't exist
+            status, message = submit_changes({full_path: (code, projected_version(full_path))}, f"Create file {filename}")
+            if status == "rejected":
+                return TOOL_NOT_EXECUTED_WORD + message
+            return "File been created successfully." + message
+        except FileChangedError as e:
+            return TOOL_NOT_EXECUTED_WORD + file_changed_during_edit.format(error_response=e)
+        except Exception as e:
+            return f"{type(e).__name__}: {e}"
+
+    return create_file_with_code
 
-            # Create directories if they don't exist
-            if not os.path.exists(directory):
-                os.makedirs(directory)
 
-            with open(full_path, 'w', encoding='utf-8') as file:
-                file.write(code)
-            return "File been created successfully."
+def prepare_apply_edits_tool(work_dir):
+    @tool
+    def apply_edits(edits):
+        """
+Apply multiple changes, in one or many files, at once. Use it instead of calling insert_code/replace_code
+many times when plan requires several changes. All edits are checked and applied together or none of them.
+Line numbers of all edits refer to file contents you see now, before any of edits; edits can't overlap.
+tool input:
+:param edits: list of edits. Every edit is json with 'action' key and:
+- for 'insert': 'filename', 'start_line' (line number to insert code after) and 'code';
+- for 'replace': 'filename', 'start_line', 'end_line' (both inclusive) and 'code';
+- for 'create': 'filename' and 'code' of new file. Other edits of the same file are not allowed with 'create'.
+Code without backticks around, starting with appropriate indentation if needed.
+Example:
+edits: [
+{"action": "replace", "filename": "src/app.py", "start_line": 10, "end_line": 14, "code": "def main():\\n    run()"},
+{"action": "insert", "filename": "src/app.py", "start_line": 2, "code": "import sys"},
+{"action": "create", "filename": "src/helpers.py", "code": "def run():\\n    pass\\n"},
+],
+"""
+        try:
+            if isinstance(edits, str):
+                edits = json.loads(edits)
+            edits_by_file = {}
+            for edit in edits:
+                edits_by_file.setdefault(edit["filename"], []).append(edit)
+
+            changes = {}
+            syntax_errors = []
+            for filename, file_edits in edits_by_file.items():
+                full_path = join_paths(work_dir, filename)
+                if any(edit["action"] == "create" for edit in file_edits):
+                    if len(file_edits) > 1:
+                        raise EditError(f"File {filename} is created, so it can't be edited in the same call.")
+                    changes[full_path] = (file_edits[0]["code"], projected_version(full_path))
+                    continue
+                snapshot = read_snapshot(full_path)
+                new_lines = apply_line_edits(snapshot.lines, file_edits)
+                file_contents = "".join(new_lines)
+                # result of all edits of file is checked once, as one edit spanning from the first to the last of them
+                start = min(int(edit["start_line"]) - (edit["action"] == "replace") for edit in file_edits)
+                end = max(int(edit["end_line" if edit["action"] == "replace" else "start_line"]) for edit in file_edits)
+                new_region = "".join(new_lines[start:len(new_lines) - (len(snapshot.lines) - end)])
+                check_syntax_response = check_edit_syntax(file_contents, filename, snapshot, start, end, new_region)
+                if check_syntax_response != "Valid syntax":
+                    syntax_errors.append(f"{filename}: {check_syntax_response}")
+                changes[full_path] = (file_contents, snapshot.content_hash)
+            if syntax_errors:
+                print("Wrong syntax provided, asking to correct.")
+                return TOOL_NOT_EXECUTED_WORD + syntax_error_apply_edits.format(error_response="\n".join(syntax_errors))
+
+            description = f"{len(edits)} edits of {', '.join(edits_by_file)}"
+            status, message = submit_changes(changes, description)
+            if status == "rejected":
+                return TOOL_NOT_EXECUTED_WORD + message
+            return f"{len(edits)} edits applied to {len(changes)} files." + message
+        except EditError as e:
+            return TOOL_NOT_EXECUTED_WORD + f"None of edits been applied. {e}"
+        except FileChangedError as e:
+            return TOOL_NOT_EXECUTED_WORD + file_changed_during_edit.format(error_response=e)
         except Exception as e:
             return f"{type(e).__name__}: {e}"
 
-    return create_file_with_code
+    return apply_edits
 
 
 @tool
@@ -0,0 +1,186 @@
+"""
+Human approval of file changes proposed by editing tools.
+
+By default every change is approved right away, blocking the tool call. With APPROVAL_MODE=queue changes are queued
+instead: agent continues working on projected state of files (disk content with queued changes applied) and human
+reviews queued changes in batches. Changes of paths matching patterns from .clean_coder/trusted_paths (gitignore
+syntax) are approved automatically.
+"""
+import os
+import hashlib
+from dotenv import load_dotenv, find_dotenv
+from src.utilities.edit_engine import write_files, FileChangedError, MISSING
+from src.utilities.edit_journal import EditJournal
+from src.utilities.file_snapshots import FileSnapshot, FileSnapshots, split_lines
+from src.utilities.start_work_functions import file_folder_ignored, Work
+from src.utilities.print_formatters import print_formatted
+from src.utilities.user_input import user_input
+
+
+load_dotenv(find_dotenv())
+approval_prompt = "Never accept changes you don't understand. Type (o)k if you accept or provide commentary."
+
+
+class ProposedChange:
+    def __init__(self, change_id, description, changes, depends_on, trusted, origin):
+        self.id = change_id
+        self.description = description
+        # path -> (new content, expected version of file before the change)
+        self.changes = changes
+        self.depends_on = depends_on
+        self.trusted = trusted
+        # (agent, step) that proposed the change, so journal entry written on approval points to it
+        self.origin = origin
+
+
+class ApprovalQueue:
+    pending = []
+    next_id = 1
+    # ids of changes not applied in the last review
+    last_not_applied = []
+
+    @staticmethod
+    def enabled():
+        return os.getenv("APPROVAL_MODE") == "queue"
+
+    @staticmethod
+    def batch_size():
+        # empty value, like in .env.template, means default
+        return int(os.getenv("APPROVAL_BATCH_SIZE") or 5)
+
+    @staticmethod
+    def latest_change(path):
+        return next((change for change in reversed(ApprovalQueue.pending) if path in change.changes), None)
+
+    @staticmethod
+    def snapshot(path):
+        """Returns snapshot of file as it will be after queued changes are applied."""
+        change = ApprovalQueue.latest_change(path)
+        if change is None:
+            return FileSnapshots.get(path)
+        content = change.changes[path][0]
+        if content is None:
+            raise FileNotFoundError(f"{path} is deleted by queued change.")
+        raw_content = content.encode('utf-8')
+        return FileSnapshot(0, len(raw_content), hashlib.sha1(raw_content).hexdigest(), split_lines(raw_content))
+
+    @staticmethod
+    def enqueue(description, changes, trusted):
+        depends_on = set()
+        for path in changes:
+            change = ApprovalQueue.latest_change(path)
+            if change:
+                depends_on.add(change.id)
+        proposed_change = ProposedChange(
+            ApprovalQueue.next_id, description, changes, depends_on, trusted, EditJournal.origin()
+        )
+        ApprovalQueue.next_id += 1
+        ApprovalQueue.pending.append(proposed_change)
+        return proposed_change
+
+    @staticmethod
+    def review_if_full():
+        if len([change for change in ApprovalQueue.pending if not change.trusted]) >= ApprovalQueue.batch_size():
+            return ApprovalQueue.review()
+        return None
+
+    @staticmethod
+    def review():
+        """
+        Asks human to review queued changes at once and applies approved ones. Rejecting a change rejects all changes
+        depending on it. Returns feedback for agent.
+        """
+        if not ApprovalQueue.pending:
+            return None
+        to_review = [change for change in ApprovalQueue.pending if not change.trusted]
+        human_message = 'o'
+        if to_review:
+            print_formatted("Changes waiting for your approval:", color="blue", bold=True)
+            for change in to_review:
+                depends = f" (depends on #{', #'.join(str(i) for i in sorted(change.depends_on))})" if change.depends_on else ""
+                print_formatted(f"#{change.id}: {change.description}{depends}", color="cyan")
+            human_message = user_input(
+                "Type (o)k to accept all changes, 'r' with numbers to reject chosen ones (like 'r 2 3') "
+                "or provide commentary to reject all of them."
+            )
+
+        if human_message in ['o', 'ok']:
+            rejected = set()
+        elif human_message.startswith('r ') and all(part.isdigit() for part in human_message[2:].split()):
+            rejected = {int(part) for part in human_message[2:].split()}
+        else:
+            rejected = {change.id for change in to_review}
+        commentary = human_message if rejected and not human_message.startswith('r ') else None
+
+        applied, not_applied = [], []
+        for change in ApprovalQueue.pending:
+            if change.id in rejected or change.depends_on & set(not_applied):
+                not_applied.append(change.id)
+                continue
+            try:
+                write_files(change.changes, origin=change.origin)
+                applied.append(change.id)
+            except FileChangedError:
+                not_applied.append(change.id)
+
+        ApprovalQueue.pending = []
+        ApprovalQueue.last_not_applied = not_applied
+        feedback = "Human reviewed queued changes. "
+        if applied:
+            feedback += f"Applied: #{', #'.join(str(i) for i in applied)}. "
+        if not_applied:
+            feedback += (
+                f"Not applied: #{', #'.join(str(i) for i in not_applied)} (rejected, depending on rejected change or "
+                f"conflicting with file changed in meantime). "
+            )
+        if commentary:
+            feedback += f"Human said: {commentary}. "
+        feedback += "File contents you see show actual state of files now."
+        return feedback
+
+
+def trusted(path):
+    trusted_paths_file = os.path.join(Work.dir(), '.clean_coder', 'trusted_paths')
+    try:
+        with open(trusted_paths_file, 'r') as file:
+            patterns = [line.strip() for line in file if line.strip() and not line.startswith('#')]
+    except FileNotFoundError:
+        return False
+    return file_folder_ignored(os.path.relpath(path, Work.dir()), patterns)
+
+
+def read_snapshot(path):
+    """Snapshot of file editing tools work on - including changes waiting for approval."""
+    return ApprovalQueue.snapshot(path) if ApprovalQueue.enabled() else FileSnapshots.get(path)
+
+
+def projected_version(path):
+    try:
+        return read_snapshot(path).content_hash
+    except FileNotFoundError:
+        return MISSING
+
+
+def submit_changes(changes, description):
+    """
+    Asks for approval of changes (dict of path -> (content, expected version)) and applies them.
+    Returns status ("applied", "queued" or "rejected") and message for agent.
+    """
+    if not ApprovalQueue.enabled():
+        human_message = user_input(approval_prompt)
+        if human_message not in ['o', 'ok']:
+            return "rejected", f"Action wasn't executed because of human interruption. He said: {human_message}"
+        write_files(changes)
+        return "applied", ""
+
+    is_trusted = all(trusted(path) for path in changes)
+    if is_trusted and not any(ApprovalQueue.latest_change(path) for path in changes):
+        write_files(changes)
+        return "applied", " Approved automatically by trust policy."
+    change = ApprovalQueue.enqueue(description, changes, is_trusted)
+    if is_trusted:
+        return "queued", f" Change #{change.id} will be applied together with changes it depends on."
+    return "queued", (
+        f" Change #{change.id} is waiting for human approval; file contents you see already include it, so "
+        f"continue with next changes."
+    )
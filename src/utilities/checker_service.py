@@ -0,0 +1,140 @@
+"""
+Persistent syntax checker worker for JavaScript, TypeScript and Vue files.
+
+One Node process (syntax_checker_worker.js) is started on the first check and reused for all next ones, so real
+parsers (typescript, @vue/compiler-sfc or acorn from project's node_modules) cost milliseconds per check instead of
+a cold start of Node. When Node or parsers are not available, checks return None and heuristic checkers are used.
+"""
+import os
+import json
+import queue
+import atexit
+import shutil
+import itertools
+import threading
+import subprocess
+
+
+CHECK_TIMEOUT = 5
+MAX_FAILURES = 3
+worker_script = os.path.join(os.path.dirname(os.path.realpath(__file__)), "syntax_checker_worker.js")
+
+
+class Diagnostic:
+    def __init__(self, line, column, message):
+        self.line = line
+        self.column = column
+        self.message = message
+
+    def __str__(self):
+        return f"line {self.line}, column {self.column}: {self.message}"
+
+
+class NodeChecker:
+    process = None
+    ids = itertools.count()
+    lock = threading.Lock()
+    # failures (worker died, hanged or could not be written to) since the last response
+    failures = 0
+    disabled = False
+    # extensions worker has no parser for
+    unsupported_extensions = set()
+
+    @staticmethod
+    def usable(filename):
+        """Tells if check of file could be done by worker, without starting it."""
+        if NodeChecker.disabled or shutil.which("node") is None:
+            return False
+        return os.path.splitext(filename)[1] not in NodeChecker.unsupported_extensions
+
+    @staticmethod
+    def start():
+        process = subprocess.Popen(
+            ["node", worker_script],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            encoding='utf-8',
+            bufsize=1,
+            env={**os.environ, "PROJECT_DIR": os.getenv("WORK_DIR") or os.getcwd()},
+        )
+        # request id -> queue waiting for response; every process has its own, so ending of a killed worker does not
+        # touch requests sent to the one started after it
+        process.waiting = {}
+        threading.Thread(target=NodeChecker.read_responses, args=(process,), daemon=True).start()
+        NodeChecker.process = process
+
+    @staticmethod
+    def stop(process=None):
+        process = process or NodeChecker.process
+        if process and process.poll() is None:
+            process.kill()
+        if process is NodeChecker.process:
+            NodeChecker.process = None
+
+    @staticmethod
+    def failed(process):
+        NodeChecker.failures += 1
+        if NodeChecker.failures > MAX_FAILURES:
+            NodeChecker.disabled = True
+        NodeChecker.stop(process)
+
+    @staticmethod
+    def read_responses(process):
+        for line in process.stdout:
+            try:
+                response = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            response_queue = process.waiting.pop(response.get("id"), None)
+            if response_queue:
+                response_queue.put(response)
+        # worker exited - nobody will answer pending requests
+        for request_id in list(process.waiting):
+            response_queue = process.waiting.pop(request_id, None)
+            if response_queue:
+                response_queue.put(None)
+
+    @staticmethod
+    def check(code, filename, timeout=CHECK_TIMEOUT):
+        """Returns list of diagnostics (empty if code is valid) or None if file can't be checked by worker."""
+        if NodeChecker.disabled or os.path.splitext(filename)[1] in NodeChecker.unsupported_extensions:
+            return None
+        if shutil.which("node") is None:
+            NodeChecker.disabled = True
+            return None
+        with NodeChecker.lock:
+            if NodeChecker.process is None or NodeChecker.process.poll() is not None:
+                NodeChecker.start()
+            process = NodeChecker.process
+            request_id = next(NodeChecker.ids)
+            response_queue = queue.Queue(maxsize=1)
+            process.waiting[request_id] = response_queue
+            try:
+                process.stdin.write(json.dumps({"id": request_id, "filename": filename, "code": code}) + "\n")
+                process.stdin.flush()
+            except OSError:
+                process.waiting.pop(request_id, None)
+                NodeChecker.failed(process)
+                return None
+        try:
+            response = response_queue.get(timeout=timeout)
+        except queue.Empty:
+            # hanging worker is killed and started again with the next check
+            process.waiting.pop(request_id, None)
+            NodeChecker.failed(process)
+            return None
+        if response is None:
+            # worker died
+            NodeChecker.failed(process)
+            return None
+        NodeChecker.failures = 0
+        if not response["available"]:
+            if "error" not in response:
+                NodeChecker.unsupported_extensions.add(os.path.splitext(filename)[1])
+            return None
+        return [Diagnostic(**diagnostic) for diagnostic in response["diagnostics"]]
+
+
+atexit.register(NodeChecker.stop)
@@ -0,0 +1,352 @@
+"""
+Single-pass lexer checking brackets and tags of JavaScript, TypeScript, JSX/TSX and Vue files.
+
+Code is read line by line once, skipping strings, comments, regex and template literals, and all brackets and tags are
+matched on one stack, so the first mismatch is reported with its exact location. Everything the lexer needs to
+continue is kept on the stack, so its state at the start of a line (snapshot) lets re-checking start from any line.
+"""
+import re
+
+
+closing_brackets = {')': '(', ']': '[', '}': '{'}
+# words after which "/" starts regex and "<" starts JSX tag, as they expect an expression
+expression_keywords = {
+    "return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else", "yield",
+    "await", "extends",
+}
+unclosed_names = {
+    "'": "string", '"': "string", '`': "template literal", '/*': "comment", '<!--': "comment", 'attr': "attribute value",
+}
+void_elements = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+}
+
+code_token = re.compile(
+    r"(?P<space>\s+)|(?P<word>[\w$]+)|(?P<comment>//|/\*)|(?P<quote>['\"`])|(?P<open>[(\[{])|(?P<close>[)\]}])"
+    r"|(?P<slash>/)|(?P<lt><)|(?P<other>[^\s\w$'\"`()\[\]{}/<]+)"
+)
+regex_literal = re.compile(r"/(?![*/])(?:[^/\\\[\n]|\\.|\[(?:[^\]\\\n]|\\.)*\])+/[a-z]*")
+string_ends = {quote: re.compile(rf"(?:[^{quote}\\\n]|\\.)*{quote}") for quote in "'\""}
+template_literal_token = re.compile(r"(?:[^`\\$]|\\.|\$(?!\{))*(?P<end>`|\$\{)?")
+tag_name = re.compile(r"<([A-Za-z][\w.:-]*)?")
+closing_tag = re.compile(r"</([A-Za-z][\w.:-]*)?\s*>")
+tag_token = re.compile(r"(?P<space>\s+)|(?P<self_close>/>)|(?P<end>>)|(?P<quote>[\"'])|(?P<brace>\{)|(?P<other>[^\s/>\"'{]+|/)")
+# <T,>(x: T) => x or <T extends U>(x: T) => x in TSX - type parameters of generic arrow function, not a tag
+type_parameters = re.compile(r"<[A-Za-z_$][\w$]*\s*(?:,|\s+extends\b)")
+vue_section = re.compile(r"<(template|script|style)\b([^>]*)>")
+script_lang = re.compile(r"""lang\s*=\s*["'](\w+)["']""")
+
+
+class LexerError(Exception):
+    pass
+
+
+class CodeLexer:
+    """
+    Stack frames are [kind, name, line, column]. Kinds: brackets '(', '[', '{'; '${' template literal substitution;
+    'jsx{' expression in JSX; '`' template literal; "'" / '"' string continued with backslash; '/*' comment;
+    'jsx<' / 'html<' tag with attributes; 'attr' quoted attribute value; 'jsx>' / 'html>' element children;
+    '<!--' html comment; '{{' Vue interpolation; 'script' and 'style' Vue sections.
+    """
+    def __init__(self, jsx=False, vue=False):
+        self.jsx = jsx
+        self.vue = vue
+        self.stack = []
+        # previous token is a value (identifier, literal, closing bracket) - then "/" means division and "<" less than
+        self.prev_value = False
+        self.line_number = 0
+
+    def mode(self):
+        return self.jsx, self.vue
+
+    @staticmethod
+    def for_file(filename):
+        extension = filename.rsplit('.', 1)[-1] if '.' in filename else ''
+        return CodeLexer(jsx=extension in ("jsx", "tsx"), vue=extension == "vue")
+
+    def snapshot(self):
+        return tuple((frame[0], frame[1]) for frame in self.stack), self.prev_value
+
+    def restore(self, snapshot, line_number=0):
+        frames, self.prev_value = snapshot
+        # positions of restored frames are unknown; full check is needed to report them
+        self.stack = [[kind, name, None, None] for kind, name in frames]
+        self.line_number = line_number
+
+    def location(self, column, line=None):
+        if column is None:
+            return "unknown position"
+        return f"line {line or self.line_number}, column {column + 1}"
+
+    def error(self, message):
+        raise LexerError(f"Invalid syntax: {message}.")
+
+    def feed_line(self, line):
+        self.line_number += 1
+        pos = 0
+        while pos < len(line):
+            kind = self.stack[-1][0] if self.stack else None
+            if kind in (None, '(', '[', '{', '${', 'jsx{', 'script'):
+                if kind is None and self.vue:
+                    pos = self.vue_top_level(line, pos)
+                else:
+                    pos = self.code(line, pos)
+            elif kind == '`':
+                pos = self.template_literal(line, pos)
+            elif kind in ("'", '"'):
+                pos = self.string(line, pos, kind, continued=True)
+            elif kind == '/*':
+                pos = self.skip_until(line, pos, '*/')
+            elif kind == '<!--':
+                pos = self.skip_until(line, pos, '-->')
+            elif kind == '{{':
+                pos = self.skip_until(line, pos, '}}')
+            elif kind == 'attr':
+                pos = self.skip_until(line, pos, self.stack[-1][1])
+            elif kind in ('jsx<', 'html<'):
+                pos = self.tag(line, pos)
+            elif kind in ('jsx>', 'html>'):
+                pos = self.children(line, pos)
+            elif kind == 'style':
+                pos = self.style(line, pos)
+
+    def finish(self):
+        """Raises LexerError if anything opened is not closed at the end of file."""
+        if not self.stack:
+            return
+        kind, name, line, column = self.stack[-1]
+        if kind in ('jsx<', 'html<', 'jsx>', 'html>'):
+            opened = f"<{name}>"
+        elif kind in unclosed_names:
+            opened = unclosed_names[kind]
+        elif kind in ('script', 'style'):
+            opened = f"<{kind}> section"
+        else:
+            opened = f"'{self.display(kind)}'"
+        self.error(f"{opened} opened at {self.location(column, line)} is never closed")
+
+    @staticmethod
+    def display(kind):
+        return '{' if kind == 'jsx{' else kind
+
+    def push(self, kind, name, column):
+        self.stack.append([kind, name, self.line_number, column])
+
+    def skip_until(self, line, pos, end):
+        end_pos = line.find(end, pos)
+        if end_pos == -1:
+            return len(line)
+        self.stack.pop()
+        return end_pos + len(end)
+
+    def jsx_enabled(self):
+        if self.vue:
+            return bool(self.stack) and self.stack[0][0] == 'script' and self.stack[0][1] in ("jsx", "tsx")
+        return self.jsx
+
+    def code(self, line, pos):
+        match = code_token.match(line, pos)
+        token = match.group()
+        group = match.lastgroup
+        if group == 'space':
+            pass
+        elif group == 'word':
+            self.prev_value = token not in expression_keywords
+        elif group == 'comment':
+            if token == '//':
+                return len(line)
+            self.push('/*', None, pos)
+            return self.skip_until(line, pos + 2, '*/')
+        elif group == 'quote':
+            if token == '`':
+                self.push('`', None, pos)
+            else:
+                return self.string(line, pos + 1, token, continued=False)
+        elif group == 'open':
+            self.push(token, None, pos)
+            self.prev_value = False
+        elif group == 'close':
+            self.close_bracket(token, pos)
+        elif group == 'slash':
+            regex = None if self.prev_value else regex_literal.match(line, pos)
+            if regex:
+                self.prev_value = True
+                return regex.end()
+            self.prev_value = False
+        elif group == 'lt':
+            return self.less_than(line, pos)
+        else:
+            self.prev_value = False
+        return match.end()
+
+    def close_bracket(self, token, pos):
+        kind = self.stack[-1][0] if self.stack else None
+        if kind == 'script':
+            kind = None
+        expected = closing_brackets[token]
+        if kind == expected or (token == '}' and kind in ('${', 'jsx{')):
+            self.stack.pop()
+            # after "}" of a block regex is more likely than division
+            self.prev_value = token != '}' or kind == 'jsx{'
+            return
+        if kind is None:
+            self.error(f"'{token}' at {self.location(pos)} has no matching '{expected}'")
+        opened = self.stack[-1]
+        self.error(
+            f"'{token}' at {self.location(pos)} closes '{self.display(kind)}' opened at "
+            f"{self.location(opened[3], opened[2])}"
+        )
+
+    def less_than(self, line, pos):
+        if self.vue and self.stack[0][0] == 'script' and line.startswith('</script', pos):
+            if len(self.stack) > 1:
+                # brackets of script have to be closed before the end of section
+                self.finish()
+            self.stack.pop()
+            end = line.find('>', pos)
+            return len(line) if end == -1 else end + 1
+        if (self.jsx_enabled() and not self.prev_value and re.match(r"<[A-Za-z>]", line[pos:pos + 2])
+                and not type_parameters.match(line, pos)):
+            name = tag_name.match(line, pos)
+            self.push('jsx<', name.group(1) or '', pos)
+            return name.end()
+        self.prev_value = False
+        return pos + 1
+
+    def string(self, line, pos, quote, continued):
+        match = string_ends[quote].match(line, pos)
+        if match:
+            if continued:
+                self.stack.pop()
+            self.prev_value = True
+            return match.end()
+        if line.rstrip('\r\n').endswith('\\'):
+            # string continued in next line
+            if not continued:
+                self.push(quote, None, pos - 1)
+            return len(line)
+        self.error(f"string at {self.location(pos - (0 if continued else 1))} is not closed")
+
+    def template_literal(self, line, pos):
+        match = template_literal_token.match(line, pos)
+        end = match.group('end')
+        if end == '`':
+            self.stack.pop()
+            self.prev_value = True
+        elif end == '${':
+            self.push('${', None, match.end() - 2)
+            self.prev_value = False
+        return match.end() if end else len(line)
+
+    def tag(self, line, pos):
+        match = tag_token.match(line, pos)
+        group = match.lastgroup
+        kind, name = self.stack[-1][0], self.stack[-1][1]
+        if group == 'self_close':
+            self.close_element()
+        elif group == 'end':
+            if kind == 'html<' and name.lower() in void_elements:
+                self.close_element()
+            else:
+                self.stack[-1][0] = 'jsx>' if kind == 'jsx<' else 'html>'
+        elif group == 'quote':
+            self.push('attr', match.group(), pos)
+        elif group == 'brace' and kind == 'jsx<':
+            self.push('jsx{', None, pos)
+            self.prev_value = False
+        return match.end()
+
+    def close_element(self):
+        self.stack.pop()
+        self.prev_value = True
+
+    def children(self, line, pos):
+        kind, name = self.stack[-1][0], self.stack[-1][1]
+        html = kind == 'html>'
+        special = re.compile(r"<|\{\{" if html else r"[<{]").search(line, pos)
+        if special is None:
+            return len(line)
+        pos = special.start()
+        if line.startswith('{', pos):
+            if html:
+                self.push('{{', None, pos)
+                return self.skip_until(line, pos + 2, '}}')
+            self.push('jsx{', None, pos)
+            self.prev_value = False
+            return pos + 1
+        if html and line.startswith('<!--', pos):
+            self.push('<!--', None, pos)
+            return self.skip_until(line, pos + 4, '-->')
+        closing = closing_tag.match(line, pos)
+        if closing:
+            closed_name = closing.group(1) or ''
+            if closed_name != name:
+                opened = self.stack[-1]
+                self.error(
+                    f"</{closed_name}> at {self.location(pos)} closes <{name}> opened at "
+                    f"{self.location(opened[3], opened[2])}"
+                )
+            self.close_element()
+            return closing.end()
+        if re.match(r"<[A-Za-z>]", line[pos:pos + 2]):
+            opened = tag_name.match(line, pos)
+            self.push('html<' if html else 'jsx<', opened.group(1) or '', pos)
+            return opened.end()
+        # "<" in text
+        return pos + 1
+
+    def vue_top_level(self, line, pos):
+        section = vue_section.search(line, pos)
+        if section is None:
+            closing = closing_tag.search(line, pos)
+            if closing:
+                self.error(f"</{closing.group(1)}> at {self.location(closing.start())} has no opening tag")
+            return len(line)
+        name = section.group(1)
+        if name == "template":
+            self.push('html>', 'template', section.start())
+        elif name == "script":
+            lang = script_lang.search(section.group(2))
+            self.push('script', lang.group(1) if lang else 'js', section.start())
+            self.prev_value = False
+        else:
+            self.push('style', None, section.start())
+        return section.end()
+
+    def style(self, line, pos):
+        # style is checked by scss compiler, only the end of section is searched for
+        end = line.find('</style', pos)
+        if end == -1:
+            return len(line)
+        self.stack.pop()
+        end = line.find('>', end)
+        return len(line) if end == -1 else end + 1
+
+
+def check_code_structure(code, filename):
+    """Checks brackets and tags of JS/TS/JSX/TSX/Vue code in one pass. Returns "Valid syntax" or error with location."""
+    lexer = CodeLexer.for_file(filename)
+    try:
+        for line in code.splitlines(keepends=True):
+            lexer.feed_line(line)
+        lexer.finish()
+    except LexerError as e:
+        return str(e)
+    return "Valid syntax"
+
+
+def line_states(lines, filename):
+    """
+    Returns lexer snapshots at the start of every line and at the end of file, or None if code is not valid.
+    """
+    lexer = CodeLexer.for_file(filename)
+    states = []
+    try:
+        for line in lines:
+            states.append(lexer.snapshot())
+            lexer.feed_line(line)
+        lexer.finish()
+    except LexerError:
+        return None
+    states.append(lexer.snapshot())
+    return states
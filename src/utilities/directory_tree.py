@@ -0,0 +1,130 @@
+"""
+Directory tree of the project shown to researcher agents.
+
+Listings of directories are kept in a snapshot persisted in .clean_coder/, and directory is re-scanned only when
+its mtime changed. Walk skips ignored directories, big directories and directories deeper than MAX_TREE_DEPTH,
+so time of building tree does not depend on repository size.
+"""
+import os
+import json
+import time
+from src.utilities.start_work_functions import file_folder_ignored, CoderIgnore
+from src.utilities.file_snapshots import RACY_MTIME_NS
+from src.utilities.file_watcher import FileWatcher
+
+
+MAX_ITEMS_IN_DIRECTORY = 30
+MAX_TREE_DEPTH = 6
+MAX_DIRECTORIES_VISITED = 500
+
+
+class DirectoryTreeSnapshot:
+    snapshots = {}
+
+    def __init__(self, work_dir):
+        self.work_dir = work_dir
+        self.snapshot_path = os.path.join(work_dir, '.clean_coder', 'directory_tree_snapshot.json')
+        self.entries = {}
+        self.modified = False
+        # rel dir -> file watcher generation when listing been confirmed as actual
+        self.watcher_generations = {}
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    @staticmethod
+    def for_work_dir(work_dir):
+        if work_dir not in DirectoryTreeSnapshot.snapshots:
+            DirectoryTreeSnapshot.snapshots[work_dir] = DirectoryTreeSnapshot(work_dir)
+        return DirectoryTreeSnapshot.snapshots[work_dir]
+
+    def list_dir(self, rel_dir):
+        """Returns (dirs, files) of directory, using the snapshot if directory not changed since last scan."""
+        full_path = os.path.normpath(os.path.join(self.work_dir, rel_dir))
+        entry = self.entries.get(rel_dir)
+        if (entry and rel_dir in self.watcher_generations and FileWatcher.realtime() and FileWatcher.watches(full_path)
+                and not FileWatcher.changed_since(full_path, self.watcher_generations[rel_dir])):
+            return entry["dirs"], entry["files"]
+        self.watcher_generations[rel_dir] = FileWatcher.current_generation()
+        mtime_ns = os.stat(full_path).st_mtime_ns
+        if entry and entry["mtime_ns"] == mtime_ns and time.time_ns() - mtime_ns > RACY_MTIME_NS:
+            return entry["dirs"], entry["files"]
+
+        dirs, files = [], []
+        with os.scandir(full_path) as scanned_entries:
+            for scanned_entry in scanned_entries:
+                try:
+                    is_dir = scanned_entry.is_dir() and not scanned_entry.is_symlink()
+                except OSError:
+                    is_dir = False
+                (dirs if is_dir else files).append(scanned_entry.name)
+        dirs.sort()
+        files.sort()
+        self.entries[rel_dir] = {"mtime_ns": mtime_ns, "dirs": dirs, "files": files}
+        self.modified = True
+        return dirs, files
+
+    def save(self):
+        if not self.modified or not os.path.isdir(os.path.dirname(self.snapshot_path)):
+            return
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(self.entries, file)
+        os.replace(tmp_path, self.snapshot_path)
+        self.modified = False
+
+
+def build_directory_tree(work_dir, max_depth=MAX_TREE_DEPTH):
+    snapshot = DirectoryTreeSnapshot.for_work_dir(work_dir)
+    forbidden = CoderIgnore.get_forbidden()
+    tree = []
+    # stack of directories to visit, in order of os.walk top-down traversal
+    dirs_to_visit = ['.']
+    visited_dirs_count = 0
+
+    while dirs_to_visit:
+        rel_dir = dirs_to_visit.pop()
+        depth = rel_dir.count('/')
+        indent = "│ " * depth
+        file_indent = "│ " * (depth + 1)
+        tree.append(f"{indent}{'└──' if depth > 0 else ''}📁 {os.path.basename(os.path.normpath(os.path.join(work_dir, rel_dir)))}")
+
+        visited_dirs_count += 1
+        if visited_dirs_count > MAX_DIRECTORIES_VISITED:
+            tree.append(f"{file_indent}Too many folders in project to display all of them. Use list_dir tool to see more.")
+            break
+        try:
+            dirs, files = snapshot.list_dir(rel_dir)
+        except OSError:
+            continue
+        # Filter out forbidden directories and files
+        dirs = [d for d in dirs if not file_folder_ignored(_join_rel(rel_dir, d), forbidden)]
+        files = [f for f in files if not file_folder_ignored(_join_rel(rel_dir, f), forbidden)]
+
+        # Check if the total number of items exceeds the threshold
+        total_items = len(dirs) + len(files)
+        if total_items > MAX_ITEMS_IN_DIRECTORY:
+            tree.append(f"{file_indent}Too many files/folders to display ({total_items} items)")
+            continue
+        elif total_items == 0:
+            tree.append(f"{file_indent}<Directory is empty>")
+            continue
+
+        # Add files to the tree
+        for i, file in enumerate(files):
+            connector = "└── " if i == len(files) - 1 else "├── "
+            tree.append(f"{file_indent}{connector}{file}")
+
+        if dirs and depth >= max_depth:
+            tree.append(f"{file_indent}Folders nested deeper not displayed ({len(dirs)} folders). Use list_dir tool to see them.")
+            continue
+        dirs_to_visit.extend(_join_rel(rel_dir, d) for d in reversed(dirs))
+
+    snapshot.save()
+    return "Content of directory tree:\n" + "\n".join(tree)
+
+
+def _join_rel(rel_dir, name):
+    return name if rel_dir == '.' else f"{rel_dir}/{name}"
@@ -0,0 +1,272 @@
+"""
+Writing of project files by editing tools.
+
+File is never modified in place: new content goes to a temporary file in the same directory, which is fsynced and
+atomically renamed over the original, so dev servers, hot reloaders and watchers never see half-written file.
+Writes to the same path are serialized by a lock held only for the write itself, never during human approval.
+"""
+import os
+import stat
+import difflib
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager, ExitStack
+from src.utilities.file_snapshots import FileSnapshots
+from src.utilities.edit_journal import EditJournal
+try:
+    import fcntl
+except ImportError:
+    # Windows - locking between processes not available, threads are still synchronized
+    fcntl = None
+
+
+# version of file which does not exist
+MISSING = None
+# expected version meaning file is overwritten whatever its content is
+ANY_VERSION = object()
+locks_dir = os.path.join(tempfile.gettempdir(), "clean_coder_locks")
+
+
+class FileChangedError(Exception):
+    pass
+
+
+class EditError(Exception):
+    pass
+
+
+class PathLocks:
+    locks = {}
+    locks_guard = threading.Lock()
+
+    @staticmethod
+    def get(path):
+        with PathLocks.locks_guard:
+            if path not in PathLocks.locks:
+                PathLocks.locks[path] = threading.Lock()
+            return PathLocks.locks[path]
+
+
+@contextmanager
+def path_lock(path):
+    """Lock of a path, for threads of this process and (advisory, if fcntl available) for other processes."""
+    path = os.path.abspath(path)
+    with PathLocks.get(path):
+        if fcntl is None:
+            yield
+            return
+        # lock file kept outside of project, to not trigger project watchers
+        os.makedirs(locks_dir, exist_ok=True)
+        lock_file_path = os.path.join(locks_dir, hashlib.sha1(path.encode('utf-8')).hexdigest() + ".lock")
+        with open(lock_file_path, 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def current_version(path):
+    """Returns hash of file content or MISSING if file does not exist."""
+    try:
+        with open(path, 'rb') as file:
+            return hashlib.sha1(file.read()).hexdigest()
+    except FileNotFoundError:
+        return MISSING
+
+
+def write_file(path, content, expected_version=ANY_VERSION):
+    """
+    Atomically replaces content of file (creates it with parent directories if needed).
+    Raises FileChangedError if file is not in expected_version anymore (changed after it was read for edit).
+    """
+    write_files({path: (content, expected_version)})
+
+
+def write_files(changes, journal=True, origin=None):
+    """
+    Writes multiple files as one transaction. changes is dict of path -> (content, expected version); content None
+    means file is deleted. Either all files are written, or none of them: versions of all files are checked before
+    first write, and files already replaced are restored if a later one fails.
+    Transaction is recorded in edit journal as made by origin (agent, step; current one by default), unless journal
+    is False.
+    """
+    paths = sorted(changes)
+    with ExitStack() as stack:
+        # always locked in the same order, so two transactions can't wait for each other
+        for path in paths:
+            stack.enter_context(path_lock(path))
+        for path in paths:
+            expected_version = changes[path][1]
+            if expected_version is not ANY_VERSION and current_version(path) != expected_version:
+                raise FileChangedError(f"{path} has been changed by someone else since it was read.")
+
+        tmp_paths = {}
+        originals = {}
+        try:
+            for path in paths:
+                if changes[path][0] is not None:
+                    tmp_paths[path] = write_temp_file(path, changes[path][0])
+            for path in paths:
+                originals[path] = read_bytes(path)
+                if changes[path][0] is None:
+                    if originals[path] is not None:
+                        os.remove(path)
+                else:
+                    os.replace(tmp_paths.pop(path), path)
+        except BaseException:
+            for tmp_path in tmp_paths.values():
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            restore_originals(originals)
+            raise
+        finally:
+            for path in paths:
+                FileSnapshots.invalidate(path)
+        for directory in {os.path.dirname(path) for path in paths}:
+            fsync_directory(directory)
+    if journal:
+        EditJournal.record([(path, decode_text(originals[path]), changes[path][0]) for path in paths], origin)
+
+
+def decode_text(raw_content):
+    # newlines normalized the same way as in file snapshots edited by tools
+    if raw_content is None:
+        return None
+    return raw_content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+
+
+def apply_line_edits(lines, edits):
+    """
+    Applies insert and replace edits to lines of file. Line numbers of all edits refer to the original lines, so edits
+    are applied from the bottom of file to not shift positions of the ones above. Raises EditError for line numbers
+    out of file or overlapping edits.
+    """
+    spans = []
+    for index, edit in enumerate(edits):
+        if edit["action"] == "insert":
+            start = end = int(edit["start_line"])
+            if not 0 <= start <= len(lines):
+                raise EditError(f"Line {start} to insert code after is out of file {edit['filename']}.")
+        elif edit["action"] == "replace":
+            start, end = int(edit["start_line"]) - 1, int(edit["end_line"])
+            if not 0 <= start < end <= len(lines):
+                raise EditError(
+                    f"Lines {edit['start_line']}-{edit['end_line']} to replace are out of file {edit['filename']} "
+                    f"or in wrong order."
+                )
+        else:
+            raise EditError(f"Unknown action {edit['action']}.")
+        spans.append((start, end, index, edit["code"]))
+
+    spans.sort()
+    for previous, following in zip(spans, spans[1:]):
+        if previous[1] > following[0]:
+            raise EditError(f"Edits {previous[2] + 1} and {following[2] + 1} change the same lines.")
+    new_lines = list(lines)
+    for start, end, _, code in reversed(spans):
+        new_lines[start:end] = [code + '\n']
+    return new_lines
+
+
+def find_snippet(lines, snippet, filename):
+    """
+    Finds lines of file matching snippet and returns (start, end) slice of them. Lines are compared ignoring trailing
+    whitespace first; if that finds nothing, with all whitespace differences ignored. Raises EditError when snippet
+    is not found or not unique.
+    """
+    if not snippet.strip():
+        raise EditError("Snippet is empty.")
+    snippet_lines = snippet.strip('\n').split('\n')
+    for normalize in (str.rstrip, normalize_whitespace):
+        normalized_snippet = [normalize(line) for line in snippet_lines]
+        normalized_lines = [normalize(line.rstrip('\n')) for line in lines]
+        matches = [
+            start for start in range(len(lines) - len(snippet_lines) + 1)
+            if normalized_lines[start:start + len(snippet_lines)] == normalized_snippet
+        ]
+        if len(matches) == 1:
+            return matches[0], matches[0] + len(snippet_lines)
+        if len(matches) > 1:
+            line_numbers = ', '.join(str(start + 1) for start in matches)
+            raise EditError(
+                f"Snippet found {len(matches)} times in {filename} (starting at lines {line_numbers}). "
+                f"Include more surrounding lines in the snippet to make it unique."
+            )
+    close_lines = difflib.get_close_matches(snippet_lines[0].strip(), list(dict.fromkeys(line.strip() for line in lines)), n=3)
+    hint = f" Similar lines in file: {close_lines}." if close_lines else ""
+    raise EditError(f"Snippet not found in {filename}.{hint} Copy snippet exactly from the file.")
+
+
+def normalize_whitespace(line):
+    return " ".join(line.split())
+
+
+def reindent(code, snippet, matched_lines):
+    """
+    Shifts indentation of code by difference between indentation of snippet written by model and lines matched in
+    file, so code written with wrong base indentation (common with whitespace-insensitive match) still fits.
+    """
+    snippet_first_line = next((line for line in snippet.split('\n') if line.strip()), "")
+    file_first_line = next((line for line in matched_lines if line.strip()), "")
+    snippet_indent = snippet_first_line[:len(snippet_first_line) - len(snippet_first_line.lstrip())]
+    file_indent = file_first_line[:len(file_first_line) - len(file_first_line.lstrip())]
+    if snippet_indent == file_indent:
+        return code
+    code_lines = code.split('\n')
+    if not all(line.startswith(snippet_indent) or not line.strip() for line in code_lines):
+        return code
+    return '\n'.join(file_indent + line[len(snippet_indent):] if line.strip() else line for line in code_lines)
+
+
+def write_temp_file(path, content):
+    """Writes content to fsynced temporary file next to path, so it can be atomically renamed over it."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    file_descriptor, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, 'w', encoding='utf-8') as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        # keep permissions of original file; mkstemp creates files readable by owner only
+        try:
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(tmp_path, 0o666 & ~umask)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def read_bytes(path):
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def restore_originals(originals):
+    for path, original in originals.items():
+        if original is None:
+            if os.path.exists(path):
+                os.remove(path)
+            continue
+        with open(path, 'wb') as file:
+            file.write(original)
+
+
+def fsync_directory(directory):
+    # makes rename durable; not supported on Windows
+    if os.name != 'posix':
+        return
+    directory_descriptor = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_descriptor)
+    finally:
+        os.close(directory_descriptor)
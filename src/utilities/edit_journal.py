@@ -0,0 +1,190 @@
+"""
+Append-only journal of file edits made by agents, stored in .clean_coder/edit_journal.jsonl.
+
+Every edit transaction (one tool call) is one line with line-level diffs of changed files, tagged with run, agent and
+step, so changes of a step, an agent or a whole run can be reverted without keeping full copies of files.
+"""
+import os
+import json
+import time
+import uuid
+import difflib
+import hashlib
+import argparse
+import threading
+
+
+class EditJournal:
+    journal_path = None
+    run_id = None
+    agent = None
+    step = 0
+    lock = threading.Lock()
+
+    @staticmethod
+    def start_run(work_dir):
+        EditJournal.journal_path = os.path.join(work_dir, '.clean_coder', 'edit_journal.jsonl')
+        # pid suffix keeps runs started in the same second apart
+        EditJournal.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        EditJournal.agent = None
+        EditJournal.step = 0
+        return EditJournal.run_id
+
+    @staticmethod
+    def start_step(agent):
+        """Called before every tool execution of agent; edits made by tools are grouped by steps."""
+        EditJournal.agent = agent
+        EditJournal.step += 1
+
+    @staticmethod
+    def origin():
+        """(agent, step) edits are made in now."""
+        return EditJournal.agent, EditJournal.step
+
+    @staticmethod
+    def record(changes, origin=None):
+        """
+        Records transaction; changes is list of (path, content before, content after); None for missing file.
+        origin is (agent, step) that proposed changes, current one by default.
+        """
+        if EditJournal.journal_path is None or not os.path.isdir(os.path.dirname(EditJournal.journal_path)):
+            return
+        agent, step = origin or EditJournal.origin()
+        entry = {
+            # uuid, as clocks of coarse resolution give the same time to entries written one after another
+            "id": uuid.uuid4().hex,
+            "run": EditJournal.run_id,
+            "agent": agent,
+            "step": step,
+            "files": [file_diff(path, old_content, new_content) for path, old_content, new_content in changes],
+        }
+        with EditJournal.lock:
+            with open(EditJournal.journal_path, 'a', encoding='utf-8') as journal:
+                journal.write(json.dumps(entry) + '\n')
+
+    @staticmethod
+    def record_rollback(reverted_ids):
+        with EditJournal.lock:
+            with open(EditJournal.journal_path, 'a', encoding='utf-8') as journal:
+                journal.write(json.dumps({"id": uuid.uuid4().hex, "reverts": reverted_ids}) + '\n')
+
+
+def content_hash(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest() if content is not None else None
+
+
+def file_diff(path, old_content, new_content):
+    old_lines = old_content.splitlines(keepends=True) if old_content is not None else []
+    new_lines = new_content.splitlines(keepends=True) if new_content is not None else []
+    # only changed regions are stored: [position in new content, old lines, new lines]
+    opcodes = [
+        [j1, old_lines[i1:i2], new_lines[j1:j2]]
+        for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes()
+        if tag != 'equal'
+    ]
+    return {
+        "path": path,
+        "created": old_content is None,
+        "deleted": new_content is None,
+        "old_hash": content_hash(old_content),
+        "new_hash": content_hash(new_content),
+        "opcodes": opcodes,
+    }
+
+
+def revert_content(new_content, opcodes):
+    lines = new_content.splitlines(keepends=True)
+    # from the bottom, so positions of earlier changes stay valid
+    for position, old_lines, new_lines in reversed(opcodes):
+        lines[position:position + len(new_lines)] = old_lines
+    return "".join(lines)
+
+
+def read_text(path):
+    try:
+        # universal newlines, like contents journaled by edit engine
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def read_journal(journal_path):
+    try:
+        with open(journal_path, 'r', encoding='utf-8') as journal:
+            return [json.loads(line) for line in journal if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def last_run_id(work_dir):
+    entries = read_journal(os.path.join(work_dir, '.clean_coder', 'edit_journal.jsonl'))
+    runs = [entry["run"] for entry in entries if entry.get("run")]
+    return runs[-1] if runs else None
+
+
+def rollback(work_dir, run_id=None, agent=None, step=None):
+    """
+    Reverts edits of run (current one by default), optionally only of given agent and step, newest first.
+    Files changed outside of journaled edits since then are left untouched and returned as conflicts; paths that
+    could not be read or written are returned as failed.
+    """
+    from src.utilities.edit_engine import write_files, current_version, FileChangedError
+
+    journal_path = os.path.join(work_dir, '.clean_coder', 'edit_journal.jsonl')
+    run_id = run_id or EditJournal.run_id or last_run_id(work_dir)
+    entries = read_journal(journal_path)
+    reverted_ids = {reverted_id for entry in entries for reverted_id in entry.get("reverts", [])}
+    entries_to_revert = [
+        entry for entry in entries
+        if entry.get("run") == run_id and entry["id"] not in reverted_ids
+        and (agent is None or entry["agent"] == agent) and (step is None or entry["step"] == step)
+    ]
+
+    reverted, conflicts, failed = [], [], []
+    for entry in reversed(entries_to_revert):
+        changes = {}
+        try:
+            for file in entry["files"]:
+                current_content = read_text(file["path"])
+                if content_hash(current_content) != file["new_hash"]:
+                    # changed after this edit by something not being reverted
+                    break
+                old_content = None if file["created"] else revert_content(current_content or "", file["opcodes"])
+                changes[file["path"]] = (old_content, current_version(file["path"]))
+        except (OSError, UnicodeDecodeError):
+            # unreadable file - entry is left as is and the rest is still reverted
+            failed.extend(file["path"] for file in entry["files"])
+            continue
+        if len(changes) != len(entry["files"]):
+            conflicts.append(entry["id"])
+            continue
+        try:
+            write_files(changes, journal=False)
+        except FileChangedError:
+            conflicts.append(entry["id"])
+            continue
+        except OSError:
+            failed.extend(changes)
+            continue
+        reverted.append(entry["id"])
+    if reverted:
+        EditJournal.journal_path = journal_path
+        EditJournal.record_rollback(reverted)
+    return reverted, conflicts, failed
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv())
+    parser = argparse.ArgumentParser(description="Revert file edits made by Clean Coder agents.")
+    parser.add_argument("--run", help="Id of run to revert; last run by default.")
+    parser.add_argument("--agent", help="Revert edits of this agent only, like Executor or Debugger.")
+    parser.add_argument("--step", type=int, help="Revert edits of this step only.")
+    args = parser.parse_args()
+    reverted, conflicts, failed = rollback(os.getenv("WORK_DIR"), args.run, args.agent, args.step)
+    print(f"Reverted {len(reverted)} edits.")
+    if conflicts:
+        print(f"{len(conflicts)} edits not reverted, as files have been changed after them.")
+    if failed:
+        print(f"Edits of files that could not be read or written not reverted: {', '.join(sorted(set(failed)))}")
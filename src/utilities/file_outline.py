@@ -0,0 +1,88 @@
+"""
+Outline of file: classes, functions, methods and types defined in it, with their line ranges.
+
+Built from tree kept in ParseCache, so outline of file checked or outlined before costs no parsing. Python files are
+outlined with ast module when tree-sitter grammar is not installed.
+"""
+import ast
+from src.utilities.parse_cache import ParseCache
+
+
+# tree-sitter node type -> name of symbol kind shown in outline
+symbol_kinds = {
+    "class_definition": "class",
+    "function_definition": "def",
+    "class_declaration": "class",
+    "abstract_class_declaration": "abstract class",
+    "function_declaration": "function",
+    "generator_function_declaration": "function*",
+    "method_definition": "method",
+    "interface_declaration": "interface",
+    "type_alias_declaration": "type",
+    "enum_declaration": "enum",
+}
+class_kinds = {"class", "abstract class"}
+function_values = {"arrow_function", "function_expression", "function", "generator_function"}
+class_values = {"class", "class_expression"}
+
+
+def file_outline(filename, content):
+    tree = ParseCache.parse(filename, content)
+    if tree is not None:
+        symbols = tree_symbols(tree.root_node, 0)
+    elif filename.endswith(".py"):
+        try:
+            symbols = ast_symbols(ast.parse(content).body, 0)
+        except SyntaxError as e:
+            return f"Outline of {filename} unavailable, file has syntax error: {e.msg} (line {e.lineno})."
+    else:
+        return f"Outline of {filename} unavailable for that file type; use see_file tool."
+    if not symbols:
+        return f"No classes or functions found in {filename}; use see_file tool."
+    lines = [f"{'  ' * depth}{start}-{end} {description}" for start, end, depth, description in symbols]
+    return f"{filename} outline (line ranges of definitions):\n\n" + "\n".join(lines)
+
+
+def tree_symbols(node, depth):
+    symbols = []
+    for child in node.named_children:
+        start_node = child
+        if child.type in ("decorated_definition", "export_statement"):
+            child = child.child_by_field_name("definition" if child.type == "decorated_definition" else "declaration")
+            if child is None:
+                continue
+        kind = symbol_kinds.get(child.type)
+        if kind:
+            symbols.append(symbol(start_node, child, depth, kind, child.child_by_field_name("name")))
+            body = child.child_by_field_name("body")
+            if kind in class_kinds and body is not None:
+                symbols.extend(tree_symbols(body, depth + 1))
+        elif child.type in ("lexical_declaration", "variable_declaration"):
+            # const handler = () => {...}
+            for declarator in child.named_children:
+                value = declarator.child_by_field_name("value")
+                if value is not None and (value.type in function_values or value.type in class_values):
+                    kind = "class" if value.type in class_values else "function"
+                    symbols.append(symbol(start_node, child, depth, kind, declarator.child_by_field_name("name")))
+        elif child.type == "public_field_definition":
+            value = child.child_by_field_name("value")
+            if value is not None and value.type in function_values:
+                symbols.append(symbol(start_node, child, depth, "method", child.child_by_field_name("name")))
+    return symbols
+
+
+def symbol(start_node, node, depth, kind, name_node):
+    name = name_node.text.decode('utf-8', errors='replace') if name_node is not None else "<anonymous>"
+    return start_node.start_point[0] + 1, node.end_point[0] + 1, depth, f"{kind} {name}"
+
+
+def ast_symbols(body, depth):
+    symbols = []
+    for node in body:
+        if isinstance(node, (ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+            kind = "class" if isinstance(node, ast.ClassDef) else "def"
+            symbols.append((start, node.end_lineno, depth, f"{kind} {node.name}"))
+            if isinstance(node, ast.ClassDef):
+                symbols.extend(ast_symbols(node.body, depth + 1))
+    return symbols
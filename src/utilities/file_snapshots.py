@@ -0,0 +1,88 @@
+"""
+In-memory snapshots of project files, used to avoid re-reading and re-numbering unchanged files on every agent step.
+"""
+import os
+import time
+import hashlib
+from src.utilities.file_watcher import FileWatcher
+
+
+# mtime is not trusted for files modified that recently, as filesystem timestamps can be coarse
+RACY_MTIME_NS = 2 * 10**9
+
+
+class FileSnapshot:
+    def __init__(self, mtime_ns, size, content_hash, lines):
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.content_hash = content_hash
+        self.lines = lines
+        self.renderings = {}
+        self.watcher_generation = 0
+
+    def render(self, line_numbers=True):
+        if line_numbers not in self.renderings:
+            if line_numbers:
+                formatted_lines = [f"{i + 1}|{line[:-1]}\n" for i, line in enumerate(self.lines)]
+            else:
+                formatted_lines = [f"{line[:-1]}\n" for line in self.lines]
+            self.renderings[line_numbers] = "".join(formatted_lines)
+        return self.renderings[line_numbers]
+
+    def render_region(self, start_line, end_line):
+        """Renders lines from start_line to end_line (1-based, inclusive) with their original line numbers."""
+        start_line = max(start_line, 1)
+        end_line = min(end_line, len(self.lines))
+        return "".join(f"{i}|{self.lines[i - 1][:-1]}\n" for i in range(start_line, end_line + 1))
+
+
+class FileSnapshots:
+    snapshots = {}
+
+    @staticmethod
+    def get(path):
+        """Returns up to date snapshot of file. Raises FileNotFoundError if file does not exist."""
+        snapshot = FileSnapshots.snapshots.get(path)
+        # watcher notifies about changes in real time, so there is no need to touch disk
+        watched = FileWatcher.realtime() and FileWatcher.watches(path)
+        if watched and snapshot and not FileWatcher.changed_since(path, snapshot.watcher_generation):
+            return snapshot
+        watcher_generation = FileWatcher.current_generation()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            FileSnapshots.snapshots.pop(path, None)
+            raise
+        if (snapshot and snapshot.mtime_ns == stat.st_mtime_ns and snapshot.size == stat.st_size
+                and time.time_ns() - stat.st_mtime_ns > RACY_MTIME_NS):
+            snapshot.watcher_generation = watcher_generation
+            return snapshot
+
+        with open(path, 'rb') as file:
+            raw_content = file.read()
+        content_hash = hashlib.sha1(raw_content).hexdigest()
+        # file been touched, but content is the same - keep rendered versions
+        if snapshot and snapshot.content_hash == content_hash:
+            snapshot.mtime_ns, snapshot.size = stat.st_mtime_ns, stat.st_size
+            snapshot.watcher_generation = watcher_generation
+            return snapshot
+
+        snapshot = FileSnapshot(stat.st_mtime_ns, stat.st_size, content_hash, split_lines(raw_content))
+        snapshot.watcher_generation = watcher_generation
+        FileSnapshots.snapshots[path] = snapshot
+        return snapshot
+
+    @staticmethod
+    def invalidate(path=None):
+        if path is None:
+            FileSnapshots.snapshots.clear()
+        else:
+            FileSnapshots.snapshots.pop(path, None)
+
+
+def split_lines(raw_content):
+    # same result as readlines() on file opened in text mode
+    text = raw_content.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+    lines = text.split('\n')
+    lines = [line + '\n' for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+    return lines
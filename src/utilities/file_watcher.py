@@ -0,0 +1,203 @@
+"""
+Optional background watcher of project files. Turned on with FILE_WATCHER env variable.
+
+Keeps in-memory index of paths, sizes, mtimes and hashes of project files. File snapshots and directory tree ask it
+whether path changed instead of touching disk, and external edits (made by human or other tools while agents work)
+are noticed without full rescan.
+Uses watchdog package (inotify on Linux) if installed, otherwise polls project directory in background thread.
+"""
+import os
+import hashlib
+import threading
+from src.utilities.start_work_functions import file_folder_ignored, CoderIgnore
+from src.utilities.print_formatters import print_formatted
+
+
+POLLING_INTERVAL_SECONDS = 2
+
+
+class FileWatcher:
+    work_dir = None
+    # full path -> [size, mtime_ns, content hash or None]; directories have size None
+    index = {}
+    # full path -> generation of last change noticed for that path
+    changes = {}
+    generation = 0
+    lock = threading.Lock()
+    observer = None
+    polling_thread = None
+    stop_event = threading.Event()
+    index_ready = False
+
+    @staticmethod
+    def start(work_dir):
+        if FileWatcher.work_dir is not None:
+            return
+        FileWatcher.work_dir = os.path.normpath(work_dir)
+        FileWatcher.stop_event.clear()
+        FileWatcher.polling_thread = threading.Thread(target=FileWatcher._run, daemon=True)
+        FileWatcher.polling_thread.start()
+
+    @staticmethod
+    def stop():
+        FileWatcher.stop_event.set()
+        # index is cleared only after scan of running thread is finished, so it can't be filled again
+        if FileWatcher.polling_thread and FileWatcher.polling_thread is not threading.current_thread():
+            FileWatcher.polling_thread.join()
+        FileWatcher.polling_thread = None
+        if FileWatcher.observer:
+            FileWatcher.observer.stop()
+            FileWatcher.observer.join()
+            FileWatcher.observer = None
+        FileWatcher.work_dir = None
+        FileWatcher.index_ready = False
+        with FileWatcher.lock:
+            FileWatcher.index.clear()
+            FileWatcher.changes.clear()
+
+    @staticmethod
+    def running():
+        return FileWatcher.work_dir is not None and FileWatcher.index_ready
+
+    @staticmethod
+    def realtime():
+        """True if changes are delivered by OS events, so watcher can be asked instead of stat-ing files."""
+        return FileWatcher.running() and FileWatcher.observer is not None
+
+    @staticmethod
+    def watches(path):
+        path = os.path.normpath(path)
+        return FileWatcher.running() and (path == FileWatcher.work_dir or path.startswith(FileWatcher.work_dir + os.sep))
+
+    @staticmethod
+    def current_generation():
+        return FileWatcher.generation
+
+    @staticmethod
+    def changed_since(path, generation):
+        return FileWatcher.changes.get(os.path.normpath(path), 0) > generation
+
+    @staticmethod
+    def stat(path):
+        """Returns (size, mtime_ns) of indexed file or None."""
+        entry = FileWatcher.index.get(os.path.normpath(path))
+        return (entry[0], entry[1]) if entry and entry[0] is not None else None
+
+    @staticmethod
+    def file_hash(path):
+        path = os.path.normpath(path)
+        entry = FileWatcher.index.get(path)
+        if entry is None or entry[0] is None:
+            return None
+        if entry[2] is None:
+            with open(path, 'rb') as file:
+                entry[2] = hashlib.sha1(file.read()).hexdigest()
+        return entry[2]
+
+    @staticmethod
+    def files():
+        """Returns full paths of all not ignored project files."""
+        with FileWatcher.lock:
+            return [path for path, entry in FileWatcher.index.items() if entry[0] is not None]
+
+    @staticmethod
+    def mark_changed(path):
+        path = os.path.normpath(path)
+        with FileWatcher.lock:
+            FileWatcher.generation += 1
+            FileWatcher.changes[path] = FileWatcher.generation
+            # creation and deletion of file changes listing of its directory
+            FileWatcher.changes[os.path.dirname(path)] = FileWatcher.generation
+            try:
+                stat = os.stat(path)
+            except OSError:
+                FileWatcher.index.pop(path, None)
+                return
+            is_dir = os.path.isdir(path)
+            FileWatcher.index[path] = [None if is_dir else stat.st_size, stat.st_mtime_ns, None]
+
+    @staticmethod
+    def _run():
+        # observer is started before scan, so changes made while scanning are not missed
+        FileWatcher.observer = _start_observer(FileWatcher.work_dir)
+        scan_generation = FileWatcher.generation
+        index = FileWatcher._scan()
+        with FileWatcher.lock:
+            FileWatcher.index = index
+            changed_during_scan = [
+                path for path, generation in FileWatcher.changes.items() if generation > scan_generation
+            ]
+        # scan could see these paths before their change
+        for path in changed_during_scan:
+            FileWatcher.mark_changed(path)
+        FileWatcher.index_ready = True
+        if FileWatcher.observer:
+            return
+        while not FileWatcher.stop_event.wait(POLLING_INTERVAL_SECONDS):
+            FileWatcher._poll()
+
+    @staticmethod
+    def _poll():
+        new_index = FileWatcher._scan()
+        old_index = FileWatcher.index
+        changed_paths = [
+            path for path, entry in new_index.items()
+            if path not in old_index or old_index[path][:2] != entry[:2]
+        ] + [path for path in old_index if path not in new_index]
+        for path in changed_paths:
+            FileWatcher.mark_changed(path)
+
+    @staticmethod
+    def _scan():
+        index = {}
+        forbidden = CoderIgnore.get_forbidden()
+        dirs_to_scan = [FileWatcher.work_dir]
+        while dirs_to_scan:
+            directory = dirs_to_scan.pop()
+            try:
+                entries = list(os.scandir(directory))
+                index[directory] = [None, os.stat(directory).st_mtime_ns, None]
+            except OSError:
+                continue
+            for entry in entries:
+                rel_path = os.path.relpath(entry.path, FileWatcher.work_dir)
+                if file_folder_ignored(rel_path, forbidden):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs_to_scan.append(entry.path)
+                    else:
+                        stat = entry.stat()
+                        index[os.path.normpath(entry.path)] = [stat.st_size, stat.st_mtime_ns, None]
+                except OSError:
+                    continue
+        return index
+
+
+def _start_observer(work_dir):
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        return None
+
+    class ChangeHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            if event.event_type in ("opened", "closed_no_write"):
+                return
+            for path in (event.src_path, getattr(event, "dest_path", "")):
+                if path and not file_folder_ignored(os.path.relpath(path, work_dir), CoderIgnore.get_forbidden()):
+                    FileWatcher.mark_changed(path)
+
+    observer = Observer()
+    observer.schedule(ChangeHandler(), work_dir, recursive=True)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+
+def start_file_watcher(work_dir):
+    if os.getenv("FILE_WATCHER", "").lower() not in ("1", "true", "yes"):
+        return
+    FileWatcher.start(work_dir)
+    print_formatted("👀 Watching project files for changes.", color="light_blue")
@@ -0,0 +1,189 @@
+"""
+Syntax checking of edits scoped to the edited region of file.
+
+For every checked version of file a parse state is kept in memory: line ranges of top-level statements for Python,
+and lexer states at the start of every line for JS/TS/JSX/TSX/Vue. An edit of a valid file is validated by parsing only
+the top-level statements it touches, or by lexing the new lines from the state before them until the lexer gets back
+to the state stored for the following line - so it costs about the size of the edit, not of the file.
+Errors, invalid files before edit, Vue styles and other languages are checked in full, which also gives exact error
+locations. Files the Node worker or tree-sitter can parse are checked in full by them, as they're more accurate than
+the lexer.
+"""
+import re
+import ast
+import hashlib
+from collections import OrderedDict
+from src.utilities.syntax_checker_functions import check_syntax, parse_scss
+from src.utilities.checker_service import NodeChecker
+from src.utilities.code_lexer import CodeLexer, LexerError, line_states
+from src.utilities.tree_sitter_parsers import TreeSitterParsers
+
+
+MAX_STATES = 32
+
+lexed_extensions = ["js", "mjs", "cjs", "ts", "jsx", "tsx", "vue"]
+
+
+def content_hash(content):
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+class ParseStates:
+    # (language mode, content hash) -> state of file version, as structure of state depends on language; functions
+    # deriving state of edited version are stored as well and called only when that version is checked again
+    states = OrderedDict()
+
+    @staticmethod
+    def get(version):
+        state = ParseStates.states.get(version)
+        if callable(state):
+            state = state()
+            ParseStates.states[version] = state
+        if state is not None:
+            ParseStates.states.move_to_end(version)
+        return state
+
+    @staticmethod
+    def put(version, state):
+        ParseStates.states[version] = state
+        ParseStates.states.move_to_end(version)
+        while len(ParseStates.states) > MAX_STATES:
+            ParseStates.states.popitem(last=False)
+
+
+def check_edit_syntax(file_content, filename, snapshot, start, end, new_region):
+    """
+    Checks syntax of file_content, being snapshot with lines[start:end] replaced with new_region text.
+    Returns the same responses as check_syntax.
+    """
+    extension = filename.rsplit('.', 1)[-1] if '.' in filename else ''
+    if extension in lexed_extensions and (NodeChecker.usable(filename) or TreeSitterParsers.get(filename)):
+        return check_syntax(file_content, filename)
+    lines = snapshot.lines
+    start = min(max(start, 0), len(lines))
+    end = min(max(end, start), len(lines))
+    new_lines = new_region.splitlines(keepends=True)
+    # edit glued to the previous line without newline changes that line as well
+    glued = start > 0 and not lines[start - 1].endswith('\n')
+    if glued or (new_region and not new_region.endswith('\n') and end < len(lines)):
+        return check_syntax(file_content, filename)
+
+    if extension == "py":
+        mode = extension
+        state = ParseStates.get((mode, snapshot.content_hash)) or python_state(lines)
+        checker = check_python_edit
+    elif extension in lexed_extensions:
+        # lexer states depend on jsx / vue mode of lexer, files lexed the same way share them
+        mode = CodeLexer.for_file(filename).mode()
+        state = ParseStates.get((mode, snapshot.content_hash)) or lexer_state(lines, filename)
+        checker = check_lexed_edit
+    else:
+        return check_syntax(file_content, filename)
+    ParseStates.put((mode, snapshot.content_hash), state)
+
+    if not state["valid"]:
+        return check_syntax(file_content, filename)
+    response, derive_state = checker(state, lines, start, end, new_lines, filename)
+    if response is None:
+        return check_syntax(file_content, filename)
+    if response == "Valid syntax":
+        ParseStates.put((mode, content_hash(file_content)), derive_state)
+    return response
+
+
+# Python
+def python_state(lines):
+    try:
+        tree = ast.parse("".join(lines))
+    except SyntaxError:
+        return {"valid": False}
+    return {"valid": True, "statements": statement_ranges(tree, 0)}
+
+
+def statement_ranges(tree, line_offset):
+    # 1-based inclusive line ranges of top-level statements, decorators included
+    return [
+        (min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])]) + line_offset,
+         node.end_lineno + line_offset)
+        for node in tree.body
+    ]
+
+
+def check_python_edit(state, lines, start, end, new_lines, filename):
+    statements = state["statements"]
+    # statements touched by edit of lines start+1..end; insertion touches statement it is placed inside of
+    touched = [
+        (first, last) for first, last in statements
+        if ((first <= end and last >= start + 1) if end > start else (first <= start < last))
+    ]
+    first_new_line = next((line for line in new_lines if line.strip() and not line.lstrip().startswith('#')), "")
+    if first_new_line[:1] in (' ', '\t'):
+        # indented code continues the statement above
+        previous = [statement for statement in statements if statement[1] <= start]
+        if previous:
+            touched.insert(0, previous[-1])
+    region_start = min([first for first, _ in touched] + [start + 1])
+    region_end = max([last for _, last in touched] + [end])
+
+    region = lines[region_start - 1:start] + new_lines + lines[end:region_end]
+    try:
+        tree = ast.parse("".join(region))
+    except Exception:
+        # error could come from code continued by the statement below (like decorator) - full parse decides
+        return None, None
+
+    line_shift = len(new_lines) - (end - start)
+
+    def derive_state():
+        return {
+            "valid": True,
+            "statements": [statement for statement in statements if statement[1] < region_start]
+            + statement_ranges(tree, region_start - 1)
+            + [(first + line_shift, last + line_shift) for first, last in statements if first > region_end],
+        }
+    return "Valid syntax", derive_state
+
+
+# JS/TS/JSX/TSX/Vue
+def lexer_state(lines, filename):
+    states = line_states(lines, filename)
+    valid = states is not None
+    if valid and filename.endswith(".vue"):
+        style_match = re.search(r'<style[^>]*>(.*?)</style>', "".join(lines), re.DOTALL)
+        valid = not style_match or not style_match.group(1) or parse_scss(style_match.group(1)) == "Valid syntax"
+    return {"valid": valid, "line_states": states}
+
+
+def in_style(lexer_snapshot):
+    frames, _ = lexer_snapshot
+    return bool(frames) and frames[0][0] == 'style'
+
+
+def check_lexed_edit(state, lines, start, end, new_lines, filename):
+    states = state["line_states"]
+    lexer = CodeLexer.for_file(filename)
+    lexer.restore(states[start], start)
+    new_states = []
+    try:
+        for line in new_lines:
+            new_states.append(lexer.snapshot())
+            lexer.feed_line(line)
+        # lines after edit are lexed until lexer is in the same state as before the edit - rest of file is lexed the same
+        synced = end
+        while synced < len(lines) and lexer.snapshot() != states[synced]:
+            new_states.append(lexer.snapshot())
+            lexer.feed_line(lines[synced])
+            synced += 1
+        if synced == len(lines):
+            lexer.finish()
+    except LexerError:
+        # error location is reported by full check, as positions of brackets opened before edit are not stored
+        return None, None
+    new_states.append(lexer.snapshot())
+    if any(in_style(lexer_snapshot) for lexer_snapshot in [states[start]] + new_states):
+        # styles are checked by scss compiler, in full
+        return None, None
+
+    def derive_state():
+        return {"valid": True, "line_states": states[:start] + new_states[:-1] + states[synced:]}
+    return "Valid syntax", derive_state
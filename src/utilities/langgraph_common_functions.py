@@ -4,8 +4,13 @@ from src.utilities.util_functions import invoke_tool, invoke_tool_native, TOOL_N
 from src.utilities.user_input import user_input
 from langgraph.graph import END
 from src.utilities.graphics import loading_animation
+from src.utilities.prompt_caching import supports_prompt_caching, add_cache_breakpoints
+from functools import lru_cache
 import threading
+import asyncio
+import math
 import sys
+import os
 
 
 multiple_tools_msg = TOOL_NOT_EXECUTED_WORD + """You made multiple tool calls at once. If you want to execute 
@@ -28,22 +33,108 @@ def _stop_loading_animation(thread):
     thread.join()
 
 
+class LLMEventLoop:
+    # one loop for all async llm calls, as async http clients of providers are bound to loop they were created in
+    loop = None
+    lock = threading.Lock()
+
+    @staticmethod
+    def run(coroutine):
+        with LLMEventLoop.lock:
+            if LLMEventLoop.loop is None:
+                LLMEventLoop.loop = asyncio.new_event_loop()
+                threading.Thread(target=LLMEventLoop.loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, LLMEventLoop.loop).result()
+
+
+@lru_cache(maxsize=None)
+def _latency_budget():
+    """Seconds from LLM_LATENCY_BUDGET, read on the first llm call; None means llms are asked one after another."""
+    value = os.getenv("LLM_LATENCY_BUDGET")
+    if not value:
+        return None
+    try:
+        latency_budget = float(value)
+    except ValueError:
+        latency_budget = None
+    if latency_budget is None or not math.isfinite(latency_budget) or latency_budget < 0:
+        print_formatted(
+            f"LLM_LATENCY_BUDGET should be a number of seconds, got '{value}'; asking LLMs one after another.",
+            color="yellow",
+        )
+        return None
+    return latency_budget
+
+
 def _get_llm_response(llms, messages, printing):
-    for llm in llms:
-        try:
-            return llm.invoke(messages)
-        except Exception as e:
-            if printing:
-                print_formatted(
-                    f"\nException happened: {e} with llm: {llm.bound.__class__.__name__}. "
-                    "Switching to next LLM if available...",
-                    color="yellow"
-                )
+    latency_budget = _latency_budget()
+    if latency_budget is not None and len(llms) > 1:
+        response = LLMEventLoop.run(_get_hedged_llm_response(llms, messages, latency_budget, printing))
+        if response is not None:
+            return response
+    else:
+        for llm in llms:
+            try:
+                return llm.invoke(_messages_for_llm(llm, messages))
+            except Exception as e:
+                if printing:
+                    _print_llm_exception(e, llm)
     if printing:
         print_formatted("Can not receive response from any llm", color="red")
     sys.exit()
 
 
+async def _get_hedged_llm_response(llms, messages, latency_budget, printing):
+    """
+    Asks the first llm; if it does not answer within latency budget (or fails), the next one is asked in parallel.
+    Returns the first good answer and cancels requests still running, or None if all llms failed.
+    """
+    llms_to_ask = list(llms)
+    pending = set()
+
+    def ask_next_llm():
+        llm = llms_to_ask.pop(0)
+        task = asyncio.create_task(llm.ainvoke(_messages_for_llm(llm, messages)))
+        task.llm = llm
+        pending.add(task)
+
+    ask_next_llm()
+    while pending:
+        done, pending = await asyncio.wait(
+            pending, timeout=latency_budget if llms_to_ask else None, return_when=asyncio.FIRST_COMPLETED
+        )
+        if not done:
+            if printing:
+                print_formatted(
+                    f"\nNo response within {latency_budget}s, asking next LLM in parallel...", color="yellow"
+                )
+            ask_next_llm()
+            continue
+        for task in done:
+            if task.exception() is None:
+                for losing_task in pending:
+                    losing_task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                return task.result()
+            if printing:
+                _print_llm_exception(task.exception(), task.llm)
+            if llms_to_ask:
+                ask_next_llm()
+    return None
+
+
+def _messages_for_llm(llm, messages):
+    return add_cache_breakpoints(messages) if supports_prompt_caching(llm) else messages
+
+
+def _print_llm_exception(e, llm):
+    print_formatted(
+        f"\nException happened: {e} with llm: {llm.bound.__class__.__name__}. "
+        "Switching to next LLM if available...",
+        color="yellow"
+    )
+
+
 def call_model(state, llms, printing=True):
     messages = state["messages"]
     loading_thread = None
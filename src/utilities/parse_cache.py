@@ -0,0 +1,93 @@
+"""
+Shared cache of tree-sitter syntax trees, used by syntax checker and file outline tool.
+
+One tree is kept per file (by name tools use for it) together with hash of content it was parsed from. Asking for
+the same content returns cached tree; asking for changed content re-parses the file incrementally - the old tree is
+edited with the changed byte range, so tree-sitter re-parses only the changed part of it.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from src.utilities.tree_sitter_parsers import TreeSitterParsers
+
+
+MAX_TREES = 64
+
+
+class ParsedFile:
+    def __init__(self, content_hash, source, tree):
+        self.content_hash = content_hash
+        self.source = source
+        self.tree = tree
+
+
+class ParseCache:
+    files = OrderedDict()
+    # parsers are not thread-safe
+    lock = threading.Lock()
+
+    @staticmethod
+    def parse(filename, content):
+        """Returns tree-sitter tree of content of file, or None if there is no parser for file type."""
+        parser = TreeSitterParsers.get(filename)
+        if parser is None:
+            return None
+        source = content.encode('utf-8')
+        content_hash = hashlib.sha1(source).hexdigest()
+        with ParseCache.lock:
+            cached = ParseCache.files.get(filename)
+            if cached and cached.content_hash == content_hash:
+                ParseCache.files.move_to_end(filename)
+                return cached.tree
+            if cached:
+                edit_tree(cached.tree, cached.source, source)
+                tree = parser.parse(source, cached.tree)
+            else:
+                tree = parser.parse(source)
+            ParseCache.files[filename] = ParsedFile(content_hash, source, tree)
+            ParseCache.files.move_to_end(filename)
+            while len(ParseCache.files) > MAX_TREES:
+                ParseCache.files.popitem(last=False)
+            return tree
+
+    @staticmethod
+    def invalidate(filename=None):
+        with ParseCache.lock:
+            if filename is None:
+                ParseCache.files.clear()
+            else:
+                ParseCache.files.pop(filename, None)
+
+
+def edit_tree(tree, old_source, new_source):
+    """Marks range of bytes changed between old and new source as edited in tree, for incremental re-parse."""
+    start = common_prefix_length(old_source, new_source)
+    # common suffix can't overlap common prefix
+    max_suffix = min(len(old_source), len(new_source)) - start
+    suffix = common_prefix_length(old_source[::-1][:max_suffix], new_source[::-1][:max_suffix])
+    old_end, new_end = len(old_source) - suffix, len(new_source) - suffix
+    tree.edit(
+        start_byte=start,
+        old_end_byte=old_end,
+        new_end_byte=new_end,
+        start_point=point(old_source, start),
+        old_end_point=point(old_source, old_end),
+        new_end_point=point(new_source, new_end),
+    )
+
+
+def common_prefix_length(first, second):
+    # binary search comparing slices, so bytes are compared in C, not one by one in Python
+    low, high = 0, min(len(first), len(second))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if first[low:middle] == second[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def point(source, byte):
+    row = source.count(b'\n', 0, byte)
+    return row, byte - (source.rfind(b'\n', 0, byte) + 1)
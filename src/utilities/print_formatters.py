@@ -2,6 +2,7 @@ import json
 import re
 import json5
 import textwrap
+from functools import lru_cache
 from termcolor import colored
 from rich.panel import Panel
 from rich.syntax import Syntax
@@ -11,9 +12,11 @@ from pygments.util import ClassNotFound
 from pygments.lexers import get_lexer_by_name, get_lexer_for_filename
 
 
+code_block_pattern = re.compile(r'```(\w+)\s*\n(.*?)\n\s*```', flags=re.DOTALL)
+
+
 def split_text_and_code(text):
-    pattern = r'```(\w+)\s*\n(.*?)\n\s*```'
-    parts = re.split(pattern, text, flags=re.DOTALL)
+    parts = code_block_pattern.split(text)
     result = []
     for i, part in enumerate(parts):
         if i == 0 or i % 3 == 0:  # Text parts
@@ -64,6 +67,8 @@ def print_formatted(content, width=None, color=None, on_color=None, bold=False,
     print(content, end=end)
 
 
+# lexers keep no state between highlightings, so one instance per language is reused
+@lru_cache(maxsize=None)
 def get_lexer(extension):
     try:
         lexer = get_lexer_by_name(extension)
@@ -103,6 +108,25 @@ def print_code_snippet(code, extension, start_line=1, title=None):
     console.print(Padding(styled_code, 1))
 
 
+def print_apply_edits(tool_input):
+    edits = tool_input.get('edits', [])
+    edits = json.loads(edits) if isinstance(edits, str) else edits
+    print_formatted(content=f"Let's introduce {len(edits)} changes at once", color='blue', bold=True)
+    for edit in edits:
+        filename = edit.get('filename', '')
+        extension = filename.split(".")[-1]
+        code = edit.get('code', '')
+        if edit.get('action') == 'insert':
+            print_formatted(content=f"Insert code after line {edit.get('start_line')}", color='blue')
+            print_code_snippet(code=code, extension=extension, start_line=int(edit.get('start_line', 0)) + 1, title=filename)
+        elif edit.get('action') == 'replace':
+            print_formatted(content=f"Code on the place of lines {edit.get('start_line')} to {edit.get('end_line')}", color='blue')
+            print_code_snippet(code=code, extension=extension, start_line=int(edit.get('start_line', 1)), title=filename)
+        else:
+            print_formatted(content="New file", color='blue')
+            print_code_snippet(code=code, extension=extension, title=filename)
+
+
 def print_error(message: str) -> None:
     print_formatted(content=message, color="red", bold=False)
 
@@ -114,6 +138,10 @@ def print_tool_message(tool_name, tool_input=None):
         message = "Looking at the file content..."
         print_formatted(content=message, color='blue', bold=True)
         print_formatted(content=tool_input, color='cyan', bold=True)
+    elif tool_name == 'see_file_outline':
+        message = "Looking at the file outline..."
+        print_formatted(content=message, color='blue', bold=True)
+        print_formatted(content=tool_input, color='cyan', bold=True)
     elif tool_name == 'list_dir':
         message = "Listing files in a directory..."
         print_formatted(content=message, color='blue', bold=True)
@@ -133,6 +161,25 @@ def print_tool_message(tool_name, tool_input=None):
         extension = tool_input['filename'].split(".")[-1]
         print_formatted(content=message, color='blue', bold=True)
         print_code_snippet(code=tool_input['code'], extension=extension, start_line=tool_input['start_line'], title=tool_input['filename'])
+    elif tool_name == 'replace_snippet':
+        message = "Let's replace code:"
+        extension = tool_input['filename'].split(".")[-1]
+        print_formatted(content=message, color='blue', bold=True)
+        print_code_snippet(code=tool_input['old_snippet'], extension=extension, title=f"{tool_input['filename']} (old)")
+        print_code_snippet(code=tool_input['code'], extension=extension, title=f"{tool_input['filename']} (new)")
+    elif tool_name == 'insert_after_snippet':
+        message = "Let's insert code after:"
+        extension = tool_input['filename'].split(".")[-1]
+        print_formatted(content=message, color='blue', bold=True)
+        print_code_snippet(code=tool_input['anchor_snippet'], extension=extension, title=tool_input['filename'])
+        print_code_snippet(code=tool_input['code'], extension=extension, title=f"{tool_input['filename']} (new)")
+    elif tool_name == 'apply_edits':
+        try:
+            print_apply_edits(tool_input)
+        except Exception:
+            # malformed edits are reported by the tool itself
+            print_formatted(content="Let's introduce changes at once", color='blue', bold=True)
+            print_formatted(content=tool_input, color='blue', bold=True)
 
     elif tool_name == 'add_task':
         message = "Let's add a task..."
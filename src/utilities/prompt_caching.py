@@ -0,0 +1,58 @@
+"""
+Prepares messages for providers supporting prompt caching.
+
+Messages marked with cache_breakpoint=True (task, plan, not edited files) form the stable prefix of conversation.
+One more breakpoint is placed on the last message before volatile content at the end (contents of edited files),
+so conversation history sent in the previous turn is read from cache as well.
+"""
+from langchain_core.messages import ToolMessage
+
+CACHE_CONTROL = {"type": "ephemeral"}
+MAX_BREAKPOINTS = 4  # Anthropic limit
+
+
+def supports_prompt_caching(llm):
+    return getattr(llm, "bound", llm).__class__.__name__ == "ChatAnthropic"
+
+
+def add_cache_breakpoints(messages):
+    breakpoint_indexes = [i for i, msg in enumerate(messages) if getattr(msg, "cache_breakpoint", False)]
+    history_end_index = _last_history_message_index(messages)
+    if history_end_index is not None and (not breakpoint_indexes or history_end_index > breakpoint_indexes[-1]):
+        breakpoint_indexes.append(history_end_index)
+    # Keep the latest breakpoints - they cover the longest prefix
+    breakpoint_indexes = breakpoint_indexes[-MAX_BREAKPOINTS:]
+
+    return [
+        _with_cache_control(msg) if i in breakpoint_indexes else msg
+        for i, msg in enumerate(messages)
+    ]
+
+
+def _last_history_message_index(messages):
+    for i in range(len(messages) - 1, -1, -1):
+        msg = messages[i]
+        if hasattr(msg, "contains_edited_file_contents") or msg.type not in ("human", "tool"):
+            continue
+        if msg.content:
+            return i
+    return None
+
+
+def _with_cache_control(msg):
+    if isinstance(msg, ToolMessage):
+        tool_result = {
+            "type": "tool_result",
+            "content": msg.content,
+            "tool_use_id": msg.tool_call_id,
+            "cache_control": CACHE_CONTROL,
+        }
+        return msg.model_copy(update={"content": [tool_result]})
+    if isinstance(msg.content, str):
+        content = [{"type": "text", "text": msg.content, "cache_control": CACHE_CONTROL}]
+    else:
+        content = [
+            {"type": "text", "text": block} if isinstance(block, str) else dict(block) for block in msg.content
+        ]
+        content[-1]["cache_control"] = CACHE_CONTROL
+    return msg.model_copy(update={"content": content})
@@ -2,7 +2,8 @@
 Place here functions that should be called when clean coder is started.
 """
 import os
-import fnmatch
+import re
+import functools
 
 
 def read_frontend_feedback_story():
@@ -12,30 +13,112 @@ def read_frontend_feedback_story():
 
 
 def file_folder_ignored(path, ignore_patterns):
-    path = path.rstrip('/')  # Remove trailing slash if present
-
-    for pattern in ignore_patterns:
-        pattern = pattern.rstrip('/')  # Remove trailing slash from pattern if present
-
-        if fnmatch.fnmatch(path, pattern) or fnmatch.fnmatch(f"{path}/", f"{pattern}/"):
-            return True
-
-    return False
+    return compile_ignore_patterns(tuple(ignore_patterns)).ignored(path)
+
+
+@functools.lru_cache(maxsize=8)
+def compile_ignore_patterns(ignore_patterns):
+    return IgnoreMatcher(ignore_patterns)
+
+
+class IgnoreMatcher:
+    """Matches paths against .coderignore patterns with gitignore semantics. Results are memoized per path."""
+    def __init__(self, ignore_patterns):
+        self.patterns = [pattern_to_regex(pattern) for pattern in ignore_patterns]
+        self.patterns = [(regex, negated) for regex, negated in self.patterns if regex is not None]
+        self.has_negations = any(negated for _, negated in self.patterns)
+        # when there are no negations, the last matching pattern doesn't matter - one regex is enough
+        self.combined_regex = re.compile("|".join(f"(?:{regex.pattern})" for regex, _ in self.patterns) or "(?!)")
+        self.memo = {}
+
+    def ignored(self, path):
+        path = path.replace(os.sep, '/').strip('/')
+        while path.startswith('./'):
+            path = path[2:]
+        if path not in self.memo:
+            parent, _, _ = path.rpartition('/')
+            # file inside of ignored directory is ignored as well, like in git
+            self.memo[path] = (bool(parent) and self.ignored(parent)) or self._matches(path)
+        return self.memo[path]
+
+    def _matches(self, path):
+        if not self.has_negations:
+            return self.combined_regex.fullmatch(path) is not None
+        for regex, negated in reversed(self.patterns):
+            if regex.fullmatch(path):
+                return not negated
+        return False
+
+
+def pattern_to_regex(pattern):
+    negated = pattern.startswith('!')
+    if negated:
+        pattern = pattern[1:]
+    elif pattern.startswith('\\'):
+        pattern = pattern[1:]
+    pattern = pattern.strip().rstrip('/')
+    if not pattern:
+        return None, negated
+    # pattern with slash inside is relative to project root, other patterns match on any level
+    anchored = '/' in pattern
+    pattern = pattern.lstrip('/')
+
+    regex = ''
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            regex += '(?:.*/)?'
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == len(pattern):
+            regex += '/.*'
+            i += 3
+        elif pattern.startswith('**', i):
+            regex += '.*'
+            i += 2
+        elif pattern[i] == '*':
+            regex += '[^/]*'
+            i += 1
+        elif pattern[i] == '?':
+            regex += '[^/]'
+            i += 1
+        elif pattern[i] == '[' and ']' in pattern[i + 2:]:
+            end = pattern.index(']', i + 2)
+            char_class = pattern[i + 1:end]
+            if char_class.startswith('!'):
+                char_class = '^' + char_class[1:]
+            regex += f"[{char_class}]"
+            i = end + 1
+        else:
+            regex += re.escape(pattern[i])
+            i += 1
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    return re.compile(regex), negated
 
 
 class CoderIgnore:
     forbidden_files_and_folders = None
+    coderignore_mtime = None
+
+    @staticmethod
+    def coderignore_path():
+        return os.path.join(Work.dir(), '.clean_coder', '.coderignore')
 
     @staticmethod
     def read_coderignore():
-        coderignore_path = os.path.join(Work.dir(), '.clean_coder', '.coderignore')
-        with open(coderignore_path, 'r') as file:
+        with open(CoderIgnore.coderignore_path(), 'r') as file:
             return [line.strip() for line in file if line.strip() and not line.startswith('#')]
 
     @staticmethod
     def get_forbidden():
-        if CoderIgnore.forbidden_files_and_folders is None:
+        # reload patterns when .coderignore has been modified
+        try:
+            mtime = os.stat(CoderIgnore.coderignore_path()).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if CoderIgnore.forbidden_files_and_folders is None or mtime != CoderIgnore.coderignore_mtime:
             CoderIgnore.forbidden_files_and_folders = CoderIgnore.read_coderignore()
+            CoderIgnore.coderignore_mtime = mtime
         return CoderIgnore.forbidden_files_and_folders
 
 
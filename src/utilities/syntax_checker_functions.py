@@ -4,23 +4,32 @@ import sass
 from lxml import etree
 import re
 from src.utilities.print_formatters import print_formatted
+from src.utilities.checker_service import NodeChecker
+from src.utilities.code_lexer import check_code_structure
+from src.utilities.tree_sitter_parsers import tree_diagnostics
+from src.utilities.parse_cache import ParseCache
 
 
 def check_syntax(file_content, filename):
     parts = filename.split(".")
     extension = parts[-1] if len(parts) > 1 else ''
+    if extension in ["js", "jsx", "mjs", "cjs", "ts", "tsx", "vue"]:
+        # real parser in persistent Node worker; tree-sitter or lexer checks below if it is not available
+        node_response = parse_with_node_checker(file_content, filename)
+        if node_response is not None:
+            return node_response
     if extension == "py":
         return parse_python(file_content)
     elif extension in ["html", "htm"]:
         return parse_html(file_content)
-    elif extension == "js":
-        return parse_javascript(file_content)
+    elif extension in ["js", "mjs", "cjs", "ts"]:
+        return parse_javascript(file_content, filename)
     elif extension in ["css", "scss"]:
         return parse_scss(file_content)
     elif extension == "vue":
         return parse_vue_basic(file_content)
-    elif extension == "tsx":
-        return parse_tsx(file_content)
+    elif extension in ["tsx", "jsx"]:
+        return parse_tsx(file_content, filename)
     elif extension in ["yml", "yaml"]:
         return parse_yaml(file_content)
     else:
@@ -28,6 +37,33 @@ def check_syntax(file_content, filename):
         return check_bracket_balance(file_content)
 
 
+def parse_with_node_checker(file_content, filename):
+    diagnostics = NodeChecker.check(file_content, filename)
+    if diagnostics is None:
+        return None
+    if diagnostics:
+        return format_diagnostics(diagnostics)
+    if filename.endswith(".vue"):
+        # styles are not checked by worker
+        style_match = re.search(r'<style[^>]*>(.*?)</style>', file_content, re.DOTALL)
+        if style_match and style_match.group(1).strip():
+            return parse_scss(style_match.group(1))
+    return "Valid syntax"
+
+
+def format_diagnostics(diagnostics):
+    return "Syntax Error: " + "; ".join(str(diagnostic) for diagnostic in diagnostics[:3])
+
+
+def parse_with_tree_sitter(code, filename):
+    # tree of previous version of file is reused, so only changed part of file is parsed again
+    tree = ParseCache.parse(filename, code)
+    if tree is None:
+        return None
+    diagnostics = tree_diagnostics(tree)
+    return format_diagnostics(diagnostics) if diagnostics else "Valid syntax"
+
+
 def parse_python(code):
     try:
         ast.parse(code)
@@ -57,73 +93,25 @@ def parse_html(html_content):
         return f"Html error occurred: {e}"
 
 
-def parse_template(code):
-    for tag in ['div', 'p', 'span', 'main']:
-        function_response = check_template_tag_balance(code, f'<{tag}', f'</{tag}>')
-        if function_response != "Valid syntax":
-            return function_response
-    return "Valid syntax"
-
-
-def parse_javascript(js_content):
-    script_part_response = check_bracket_balance(js_content)
-    if script_part_response != "Valid syntax":
-        return script_part_response
-    return "Valid syntax"
-
-
-def check_template_tag_balance(code, open_tag, close_tag):
-    opened_tags_count = 0
-    open_tag_len = len(open_tag)
-    close_tag_len = len(close_tag)
-
-    i = 0
-    while i < len(code):
-        # check for open tag plus '>' or space after
-        if code[i:i + open_tag_len] == open_tag and code[i + open_tag_len] in [' ', '>', '\n']:
-            opened_tags_count += 1
-            i += open_tag_len
-        elif code[i:i + close_tag_len] == close_tag:
-            opened_tags_count -= 1
-            i += close_tag_len
-            if opened_tags_count < 0:
-                return f"Invalid syntax, mismatch of {open_tag} and {close_tag}"
-        else:
-            i += 1
-
-    if opened_tags_count == 0:
-        return "Valid syntax"
-    else:
-        return f"Invalid syntax, mismatch of {open_tag} and {close_tag}"
-
-
-def bracket_balance(code, beginnig_bracket='{', end_bracket='}'):
-    opened_brackets_count = 0
-
-    for char in code:
-        if char == beginnig_bracket:
-            opened_brackets_count += 1
-        elif char == end_bracket:
-            opened_brackets_count -= 1
-            if opened_brackets_count < 0:
-                return f"Invalid syntax, mismatch of {beginnig_bracket} and {end_bracket}"
-
-    if opened_brackets_count == 0:
-        return "Valid syntax"
-    else:
-        return f"Invalid syntax, mismatch of {beginnig_bracket} and {end_bracket}"
+def parse_javascript(js_content, filename="file.js"):
+    return parse_with_tree_sitter(js_content, filename) or check_code_structure(js_content, filename)
 
 
 def check_bracket_balance(code):
-    bracket_response = bracket_balance(code, beginnig_bracket='(', end_bracket=')')
-    if bracket_response != "Valid syntax":
-        return bracket_response
-    bracket_response = bracket_balance(code, beginnig_bracket='[', end_bracket=']')
-    if bracket_response != "Valid syntax":
-        return bracket_response
-    bracket_response = bracket_balance(code, beginnig_bracket='{', end_bracket='}')
-    if bracket_response != "Valid syntax":
-        return bracket_response
+    # used for languages without own checker, so strings and comments can't be recognized
+    opened = []
+    for line_number, line in enumerate(code.splitlines(), start=1):
+        for column, char in enumerate(line, start=1):
+            if char in "([{":
+                opened.append((char, line_number, column))
+            elif char in ")]}":
+                expected = {')': '(', ']': '[', '}': '{'}[char]
+                if not opened or opened[-1][0] != expected:
+                    return f"Invalid syntax, mismatch of {expected} and {char} (line {line_number}, column {column})"
+                opened.pop()
+    if opened:
+        char, line_number, column = opened[-1]
+        return f"Invalid syntax, '{char}' opened at line {line_number}, column {column} is never closed"
     return "Valid syntax"
 
 
@@ -137,22 +125,11 @@ def parse_scss(scss_code):
         return f"CSS/SCSS syntax error: {e}"
 
 
-# That function does not guarantee finding all the syntax errors in template and script part; but mostly works
+# Brackets and tags of template and script are checked by lexer, style by scss compiler
 def parse_vue_basic(content):
-    start_tag_template = re.search(r'<template>', content).end()
-    end_tag_template = content.rindex('</template>')
-    template = content[start_tag_template:end_tag_template]
-    template_part_response = parse_template(template)
-    if template_part_response != "Valid syntax":
-        return template_part_response
-
-    try:
-        script = re.search(r'<script[^>]*>(.*?)</script>', content, re.DOTALL).group(1)
-    except AttributeError:
-        return "Script part has no valid open/closing tags."
-    script_part_response = check_bracket_balance(script)
-    if script_part_response != "Valid syntax":
-        return script_part_response
+    structure_response = check_code_structure(content, "file.vue")
+    if structure_response != "Valid syntax":
+        return structure_response
 
     style_match = re.search(r'<style[^>]*>(.*?)</style>', content, re.DOTALL)
     if style_match:
@@ -176,34 +153,8 @@ def parse_javascript_esprima(js_content):
         return f"JavaScript syntax error: {e}"
 
 
-# Function under development
-def lint_vue_code(code_string):
-    import subprocess
-    import os
-    eslint_config_path = '.eslintrc.js'
-    temp_file_path = "dzik.vue"
-    # Create a temporary file
-    with open(temp_file_path, 'w', encoding='utf-8') as file:
-        file.write(code_string)
-    try:
-        # Run ESLint on the temporary file
-        result = subprocess.run(['D:\\NodeJS\\npx.cmd', 'eslint', '--config', eslint_config_path, temp_file_path, '--fix'], check=True, text=True, capture_output=True)
-        print("Linting successful:", result.stdout)
-    except subprocess.CalledProcessError as e:
-        print("Error during linting:", e.stderr)
-    finally:
-        # Clean up by deleting the temporary file
-        os.remove(temp_file_path)
-
-
-def parse_tsx(tsx_code):
-    template_response = parse_template(tsx_code)
-    if template_response != "Valid syntax":
-        return template_response
-    bracket_balance_response = check_bracket_balance(tsx_code)
-    if bracket_balance_response != "Valid syntax":
-        return bracket_balance_response
-    return "Valid syntax"
+def parse_tsx(tsx_code, filename="file.tsx"):
+    return parse_with_tree_sitter(tsx_code, filename) or check_code_structure(tsx_code, filename)
 
 
 def parse_yaml(yaml_string):
@@ -0,0 +1,95 @@
+// Long-lived syntax checker for JavaScript, TypeScript and Vue files, started once by checker_service.py.
+// Protocol: one JSON request per line on stdin ({id, filename, code}), one JSON response per line on stdout
+// ({id, available, diagnostics: [{line, column, message}]}). Parsers are loaded from the project's node_modules
+// (PROJECT_DIR env variable) first; "available" is false when no parser for the file type can be found, and comes with
+// "error" when the parser exists but can't judge this one file (like JSX in .js file checked with acorn).
+const readline = require('readline');
+
+function tryRequire(name) {
+    try {
+        return require(require.resolve(name, { paths: [process.env.PROJECT_DIR || process.cwd(), __dirname] }));
+    } catch (e) {
+        return null;
+    }
+}
+
+const ts = tryRequire('typescript');
+const compilerSfc = tryRequire('@vue/compiler-sfc');
+const acorn = tryRequire('acorn');
+// older acorn (like 7, hoisted by old webpack) does not know ecmaVersion 'latest' and would parse code as ES5
+const acornUsable = acorn !== null && parseInt(acorn.version, 10) >= 8;
+// returned when parser can't judge this file, so other checkers are used for it without disabling the worker
+const NOT_APPLICABLE = 'parser not applicable to this file';
+
+function scriptKind(filename) {
+    if (filename.endsWith('.tsx')) return ts.ScriptKind.TSX;
+    if (filename.endsWith('.ts')) return ts.ScriptKind.TS;
+    if (filename.endsWith('.jsx')) return ts.ScriptKind.JSX;
+    return ts.ScriptKind.JS;
+}
+
+function checkScript(code, filename, lineOffset) {
+    if (ts) {
+        const sourceFile = ts.createSourceFile(filename, code, ts.ScriptTarget.Latest, false, scriptKind(filename));
+        return sourceFile.parseDiagnostics.map((diagnostic) => {
+            const position = sourceFile.getLineAndCharacterOfPosition(diagnostic.start);
+            return {
+                line: position.line + 1 + lineOffset,
+                column: position.character + 1,
+                message: ts.flattenDiagnosticMessageText(diagnostic.messageText, '\n'),
+            };
+        });
+    }
+    if (acornUsable && /\.(js|mjs|cjs)$/.test(filename)) {
+        try {
+            acorn.parse(code, { ecmaVersion: 'latest', sourceType: 'module', locations: true });
+            return [];
+        } catch (error) {
+            // acorn knows no JSX, which React projects often keep in .js files
+            if (code[error.pos] === '<') return NOT_APPLICABLE;
+            const location = error.loc || { line: 1, column: 0 };
+            return [{ line: location.line + lineOffset, column: location.column + 1, message: error.message }];
+        }
+    }
+    return null;
+}
+
+function checkVue(code, filename) {
+    if (!compilerSfc) return null;
+    const { descriptor, errors } = compilerSfc.parse(code, { filename });
+    const diagnostics = errors.map((error) => ({
+        line: error.loc ? error.loc.start.line : 1,
+        column: error.loc ? error.loc.start.column : 1,
+        message: error.message,
+    }));
+    for (const block of [descriptor.script, descriptor.scriptSetup]) {
+        if (!block) continue;
+        const scriptDiagnostics = checkScript(block.content, `${filename}.${block.lang || 'js'}`, block.loc.start.line - 1);
+        if (scriptDiagnostics === NOT_APPLICABLE) return NOT_APPLICABLE;
+        if (scriptDiagnostics) diagnostics.push(...scriptDiagnostics);
+    }
+    return diagnostics;
+}
+
+function check(request) {
+    const diagnostics = request.filename.endsWith('.vue')
+        ? checkVue(request.code, request.filename)
+        : checkScript(request.code, request.filename, 0);
+    if (diagnostics === NOT_APPLICABLE) {
+        return { id: request.id, available: false, diagnostics: [], error: NOT_APPLICABLE };
+    }
+    return { id: request.id, available: diagnostics !== null, diagnostics: diagnostics || [] };
+}
+
+const input = readline.createInterface({ input: process.stdin });
+input.on('line', (line) => {
+    let response;
+    try {
+        response = check(JSON.parse(line));
+    } catch (error) {
+        let id = null;
+        try { id = JSON.parse(line).id; } catch (e) { /* request not parsable, answered without id */ }
+        response = { id, available: false, diagnostics: [], error: String(error) };
+    }
+    process.stdout.write(JSON.stringify(response) + '\n');
+});
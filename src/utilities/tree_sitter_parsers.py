@@ -0,0 +1,63 @@
+"""
+Tree-sitter parsers of JavaScript, JSX, TypeScript, TSX and Python files.
+
+Grammars come from optional tree-sitter, tree-sitter-javascript, tree-sitter-typescript and tree-sitter-python
+packages; parser for every language is created once and reused. When packages are not installed, parsers are None and
+other checkers are used. Trees are parsed through ParseCache (parse_cache.py).
+"""
+from src.utilities.checker_service import Diagnostic
+
+
+MAX_DIAGNOSTICS = 3
+# extension -> (grammar package, function returning language)
+grammars = {
+    "js": ("tree_sitter_javascript", "language"),
+    "mjs": ("tree_sitter_javascript", "language"),
+    "cjs": ("tree_sitter_javascript", "language"),
+    "jsx": ("tree_sitter_javascript", "language"),
+    "ts": ("tree_sitter_typescript", "language_typescript"),
+    "tsx": ("tree_sitter_typescript", "language_tsx"),
+    "py": ("tree_sitter_python", "language"),
+}
+
+
+class TreeSitterParsers:
+    # (grammar package, language function) -> parser, or None if grammar is not available
+    parsers = {}
+
+    @staticmethod
+    def get(filename):
+        extension = filename.rsplit('.', 1)[-1] if '.' in filename else ''
+        grammar = grammars.get(extension)
+        if grammar is None:
+            return None
+        if grammar not in TreeSitterParsers.parsers:
+            TreeSitterParsers.parsers[grammar] = TreeSitterParsers.create(*grammar)
+        return TreeSitterParsers.parsers[grammar]
+
+    @staticmethod
+    def create(package, language_function):
+        try:
+            import importlib
+            from tree_sitter import Language, Parser
+            language = Language(getattr(importlib.import_module(package), language_function)())
+            return Parser(language)
+        except (ImportError, AttributeError, TypeError, ValueError):
+            return None
+
+
+def tree_diagnostics(tree):
+    """Returns diagnostics of syntax errors (ERROR and MISSING nodes) found in tree, in order of appearance."""
+    diagnostics = []
+    nodes = [tree.root_node]
+    while nodes and len(diagnostics) < MAX_DIAGNOSTICS:
+        node = nodes.pop()
+        line, column = node.start_point[0] + 1, node.start_point[1] + 1
+        if node.is_missing:
+            diagnostics.append(Diagnostic(line, column, f"missing '{node.type}'"))
+        elif node.is_error:
+            text = node.text.decode('utf-8', errors='replace').split('\n')[0].strip()
+            diagnostics.append(Diagnostic(line, column, f"unexpected '{text[:40]}'"))
+        elif node.has_error:
+            nodes.extend(reversed(node.children))
+    return diagnostics
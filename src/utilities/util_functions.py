@@ -1,4 +1,5 @@
 import re
+import json
 import json5
 import os
 import xml.etree.ElementTree as ET
@@ -6,6 +7,8 @@ import base64
 import requests
 from src.utilities.start_work_functions import file_folder_ignored, CoderIgnore
 from src.utilities.print_formatters import print_formatted
+from src.utilities.approval_queue import read_snapshot
+from src.utilities.directory_tree import build_directory_tree
 from dotenv import load_dotenv, find_dotenv
 from todoist_api_python.api import TodoistAPI
 from langchain_core.messages import HumanMessage, ToolMessage
@@ -59,16 +62,10 @@ def watch_file(filename, work_dir, line_numbers=True):
     if file_folder_ignored(filename, CoderIgnore.get_forbidden()):
         return "You are not allowed to work with this file."
     try:
-        with open(join_paths(work_dir, filename), 'r', encoding='utf-8') as file:
-            lines = file.readlines()
+        snapshot = read_snapshot(join_paths(work_dir, filename))
     except FileNotFoundError:
         return "File not exists."
-    if line_numbers:
-        formatted_lines = [f"{i + 1}|{line[:-1]}\n" for i, line in enumerate(lines)]
-    else:
-        formatted_lines = [f"{line[:-1]}\n" for line in lines]
-    file_content = "".join(formatted_lines)
-    file_content = filename + ":\n\n" + file_content
+    file_content = filename + ":\n\n" + snapshot.render(line_numbers)
 
     return file_content
 
@@ -174,38 +171,7 @@ def get_joke():
 
 
 def list_directory_tree(work_dir):
-    tree = []
-    for root, dirs, files in os.walk(work_dir):
-        # Filter out forbidden directories and files
-        dirs[:] = [d for d in dirs if not file_folder_ignored(d, CoderIgnore.get_forbidden())]
-        files = [f for f in files if not file_folder_ignored(f, CoderIgnore.get_forbidden())]
-        rel_path = os.path.relpath(root, work_dir)
-        depth = rel_path.count(os.sep)
-        indent = "│ " * depth
-
-        # Add current directory to the tree
-        tree.append(f"{indent}{'└──' if depth > 0 else ''}📁 {os.path.basename(root)}")
-
-        # Check if the total number of items exceeds the threshold
-        total_items = len(dirs) + len(files)
-        if total_items > 30:
-            file_indent = "│ " * (depth + 1)
-            tree.append(f"{file_indent}Too many files/folders to display ({total_items} items)")
-            dirs.clear()
-            continue
-        elif total_items == 0:
-            file_indent = "│ " * (depth + 1)
-            tree.append(f"{file_indent}<Directory is empty>")
-            dirs.clear()
-            continue
-
-        # Add files to the tree
-        file_indent = "│ " * (depth + 1)
-        for i, file in enumerate(files):
-            connector = "└── " if i == len(files) - 1 else "├── "
-            tree.append(f"{file_indent}{connector}{file}")
-
-    return "Content of directory tree:\n" + "\n".join(tree)
+    return build_directory_tree(work_dir)
 
 
 def invoke_tool(tool_call, tools):
@@ -226,18 +192,85 @@ def invoke_tool_native(tool_call, tools):
 
 
 def exchange_file_contents(state, files, work_dir):
-    # Remove old one
-    state["messages"] = [msg for msg in state["messages"] if not hasattr(msg, "contains_file_contents")]
-    # Add new file contents
-    file_contents = check_file_contents(files, work_dir)
-    file_contents = f"Find most actual file contents here:\n\n{file_contents}\nTake a look at line numbers before introducing changes."
-    file_contents_msg = HumanMessage(content=file_contents, contains_file_contents=True)
-    state["messages"].insert(2, file_contents_msg)  # insert after the system and plan msgs
+    """
+    Refreshes file contents in messages. Files not changed so far stay in the stable message at the beginning of
+    conversation, so the prompt prefix can be cached by provider. Changed files (by tools, human or approval of queued
+    changes) are moved to the message placed at the end of conversation, refreshed after every tool call.
+    """
+    stable_msg_index = _find_message_index(state, "contains_file_contents")
+    edited_msg_index = _find_message_index(state, "contains_edited_file_contents")
+    stable_blocks = getattr(state["messages"][stable_msg_index], "file_blocks", None) if stable_msg_index is not None else None
+    edited_blocks = state["messages"][edited_msg_index].file_blocks if edited_msg_index is not None else {}
+    files = set(files)
+    # every file is rendered again, as it could be changed without a tool call too (by human, in ask_human actions);
+    # file snapshots stat files and read again only changed ones
+    current_blocks = render_file_blocks(files, work_dir)
+
+    if stable_blocks is None:
+        edited_files = set(edited_blocks) & files
+        stable_files = sorted(files - edited_files)
+    else:
+        # file stays in stable message as long as its content is the same (e.g. tool call changing it was rejected)
+        changed_files = {
+            filename for filename in stable_blocks
+            if filename in files and current_blocks[filename] != stable_blocks[filename]
+        }
+        edited_files = (set(edited_blocks) | changed_files | (files - set(stable_blocks))) & files
+        stable_files = [filename for filename in stable_blocks if filename in files and filename not in edited_files]
+
+    new_stable_blocks = {filename: current_blocks[filename] for filename in stable_files}
+    stable_msg = file_contents_message(new_stable_blocks)
+    if stable_msg_index is None:
+        state["messages"].insert(2, stable_msg)  # insert after the system and plan msgs
+    elif stable_msg.content != state["messages"][stable_msg_index].content:
+        state["messages"][stable_msg_index] = stable_msg
+
+    # keep order of already edited files, so message content does not change without a reason
+    new_edited_blocks = {filename: current_blocks[filename] for filename in edited_blocks if filename in edited_files}
+    for filename in sorted(edited_files - set(new_edited_blocks)):
+        new_edited_blocks[filename] = current_blocks[filename]
+    state["messages"] = [msg for msg in state["messages"] if not hasattr(msg, "contains_edited_file_contents")]
+    if new_edited_blocks:
+        state["messages"].append(edited_file_contents_message(new_edited_blocks))
     return state
 
 
+def _find_message_index(state, attribute):
+    return next((i for i, msg in enumerate(state["messages"]) if hasattr(msg, attribute)), None)
+
+
+def render_file_blocks(files, work_dir):
+    return {filename: watch_file(filename, work_dir) for filename in files}
+
+
+def _join_file_blocks(file_blocks):
+    return "".join(block + "\n\n###\n\n" for block in file_blocks.values())
+
+
+def file_contents_message(file_blocks):
+    file_contents = f"Find most actual file contents here:\n\n{_join_file_blocks(file_blocks)}\nTake a look at line numbers before introducing changes."
+    return HumanMessage(content=file_contents, contains_file_contents=True, file_blocks=file_blocks, cache_breakpoint=True)
+
+
+def edited_file_contents_message(file_blocks):
+    file_contents = f"Find most actual contents of files you edited here (they replace versions of these files you seen before):\n\n{_join_file_blocks(file_blocks)}\nTake a look at line numbers before introducing changes."
+    return HumanMessage(content=file_contents, contains_edited_file_contents=True, file_blocks=file_blocks)
+
+
+def edits_of_tool_call(tool_call):
+    edits = tool_call["args"].get("edits", [])
+    if isinstance(edits, str):
+        try:
+            edits = json.loads(edits)
+        except json.JSONDecodeError:
+            return []
+    return [edit for edit in edits if isinstance(edit, dict)]
+
+
 def bad_tool_call_looped(state):
-    last_human_messages = [m for m in state["messages"] if m.type == "human"][-4:]
+    last_human_messages = [
+        m for m in state["messages"] if m.type == "human" and not hasattr(m, "contains_edited_file_contents")
+    ][-4:]
     tool_not_executed_msgs = [
         m for m in last_human_messages if isinstance(m.content, str) and m.content.startswith(TOOL_NOT_EXECUTED_WORD)
     ]
@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+from langchain_core.messages import HumanMessage, SystemMessage
+from src.utilities.start_work_functions import Work, CoderIgnore
+from src.utilities.file_snapshots import FileSnapshots
+from src.utilities.util_functions import exchange_file_contents
+
+
+class TestExchangeFileContents(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.work_dir, '.clean_coder'))
+        with open(os.path.join(self.work_dir, '.clean_coder', '.coderignore'), 'w') as file:
+            file.write('.clean_coder/\n')
+        Work.work_dir = self.work_dir
+        CoderIgnore.forbidden_files_and_folders = None
+        FileSnapshots.invalidate()
+        self.write('a.py', 'a = 1\n')
+        self.write('b.py', 'b = 1\n')
+        self.files = {'a.py', 'b.py'}
+        self.state = {"messages": [SystemMessage(content="system"), HumanMessage(content="plan")]}
+        self.state = exchange_file_contents(self.state, self.files, self.work_dir)
+
+    def tearDown(self):
+        Work.work_dir = None
+        CoderIgnore.forbidden_files_and_folders = None
+        FileSnapshots.invalidate()
+        shutil.rmtree(self.work_dir)
+
+    def write(self, filename, content):
+        with open(os.path.join(self.work_dir, filename), 'w') as file:
+            file.write(content)
+
+    def messages_with(self, attribute):
+        return [msg for msg in self.state["messages"] if hasattr(msg, attribute)]
+
+    def test_file_changed_on_disk_is_moved_to_edited_message(self):
+        stable_msg = self.messages_with("contains_file_contents")[0]
+        self.write('a.py', 'a = 2\nc = 3\n')
+
+        self.state = exchange_file_contents(self.state, self.files, self.work_dir)
+
+        edited_msgs = self.messages_with("contains_edited_file_contents")
+        self.assertEqual(len(edited_msgs), 1)
+        self.assertEqual(list(edited_msgs[0].file_blocks), ['a.py'])
+        self.assertIn("1|a = 2\n2|c = 3", edited_msgs[0].content)
+        self.assertIs(self.state["messages"][-1], edited_msgs[0])
+        new_stable_msg = self.messages_with("contains_file_contents")[0]
+        self.assertEqual(list(new_stable_msg.file_blocks), ['b.py'])
+        self.assertNotIn("a = 1", new_stable_msg.content)
+        self.assertNotEqual(new_stable_msg.content, stable_msg.content)
+
+    def test_unchanged_files_keep_stable_message(self):
+        stable_msg = self.messages_with("contains_file_contents")[0]
+
+        self.state = exchange_file_contents(self.state, self.files, self.work_dir)
+
+        self.assertIs(self.messages_with("contains_file_contents")[0], stable_msg)
+        self.assertEqual(self.messages_with("contains_edited_file_contents"), [])
+
+
+if __name__ == '__main__':
+    unittest.main()